@@ -7,7 +7,10 @@ from flask import Flask
 import secrets
 import os
 
-from database import init_database, init_inventory_database, get_all_inventory_items, migrate_csv_to_database
+from database import (
+    init_database, init_inventory_database, get_all_inventory_items, migrate_csv_to_database,
+    begin_request_memo, end_request_memo
+)
 
 # Import blueprints
 from routes import (
@@ -28,6 +31,10 @@ from routes import (
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
 
+# Repeated identical inventory reads within one request are answered from memory
+app.before_request(begin_request_memo)
+app.teardown_request(end_request_memo)
+
 # Initialize databases
 init_database()
 init_inventory_database()
@@ -1,21 +1,316 @@
+import atexit
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import json
+import queue
+import time
+from collections import Counter
 from datetime import datetime
+from itertools import chain, combinations, islice
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used instead
+    orjson = None
 
 DATABASE_PATH = 'ims_users.db'
 INVENTORY_DB_PATH = 'ims_inventory.db'
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
+# Values accepted as "true" for the IsAssigned column
+_TRUTHY = frozenset(('True', 'true', '1', True, 1))
+
+# Keep IN (...) lists under SQLite's default host parameter limit (999 before 3.32)
+_MAX_IN_PARAMS = 900
+
+# INSERT/UPDATE ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _batched(items, size=_MAX_IN_PARAMS):
+    """Yield consecutive slices of items, each at most size long"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _json_dumps(obj):
+    """Serialize obj to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits; let json handle them
+    return json.dumps(obj)
+
+def _json_loads(text):
+    """Parse a JSON string (or bytes), using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# =============================================================================
+# PER-REQUEST MEMOIZATION
+# =============================================================================
+
+# Results of @request_memoize functions for the request running on this thread.
+# `results` is None outside a request, in which case nothing is memoized.
+_request_memo = threading.local()
+
+def begin_request_memo():
+    """Start memoizing read results for the current request (before_request hook)"""
+    _request_memo.results = {}
+
+def end_request_memo(exc=None):
+    """Drop the current request's memoized results (teardown_request hook)"""
+    _request_memo.results = None
+
+def _clear_request_memo():
+    """Forget memoized results after this thread wrote to a database"""
+    results = getattr(_request_memo, 'results', None)
+    if results:
+        results.clear()
+
+def request_memoize(func):
+    """
+    Memoize func for the rest of the current request, keyed on its arguments.
+
+    The memo is cleared whenever the same thread commits or rolls back changes
+    through a pooled or writer connection, so reads after a write see it.
+    Memoized results are shared between callers and must not be mutated.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        results = getattr(_request_memo, 'results', None)
+        if results is None:
+            return func(*args, **kwargs)
+        key = (func.__name__, args, frozenset(kwargs.items()))
+        try:
+            return results[key]
+        except KeyError:
+            value = results[key] = func(*args, **kwargs)
+            return value
+        except TypeError:  # unhashable argument
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# =============================================================================
+# CONNECTION POOLING
+# =============================================================================
+
+# Applied to every connection when it is opened. journal_mode=WAL is persisted
+# in the database file, so it is only set on the first connection per database.
+# Busy timeout is already 5s via sqlite3.connect's default timeout.
+# foreign_keys stays off: reservation history rows reference inventory serials
+# and criteria that are deleted and restored independently of that history.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MiB
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA analysis_limit=400",  # bounds the ANALYZE work done by PRAGMA optimize
+)
+_wal_enabled = set()  # database paths already switched to WAL in this process
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to the pool it came from"""
+
+    def close(self):
+        pool = getattr(self, 'pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+
+# Prepared statements kept per connection (the sqlite3 default is 128). Pooled
+# connections live long enough for the cache to matter, so leave room for the
+# dynamic filter queries as well as the fixed statements.
+_STATEMENT_CACHE_SIZE = 256
+
+def _open_connection(path, read_only=False):
+    """
+    Open a connection to path with the standard row factory and pragmas.
+
+    read_only connections are opened with mode=ro and query_only set, so any
+    write through them fails; the database must already exist and be in WAL mode.
+    """
+    if read_only:
+        target = Path(os.path.abspath(path)).as_uri() + '?mode=ro'
+    else:
+        target = path
+    conn = sqlite3.connect(target, check_same_thread=False, factory=PooledConnection,
+                           cached_statements=_STATEMENT_CACHE_SIZE, uri=read_only)
     conn.row_factory = sqlite3.Row
+    if not read_only and path not in _wal_enabled:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled.add(path)
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only=1")
     return conn
 
+
+def _optimize_after_writes(conn):
+    """
+    Refresh planner statistics once a connection has written.
+
+    Reservations and fulfilments keep toggling the inventory state columns, so
+    sqlite_stat1 drifts; PRAGMA optimize only re-analyzes tables that need it
+    and analysis_limit keeps each pass cheap.
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+
+
+class ConnectionPool:
+    """
+    Pool of long-lived SQLite connections to one database file.
+
+    Connections keep their page cache and prepared statements between calls
+    instead of being reopened for every query. acquire() never blocks: when no
+    idle connection is available a new one is opened, and release() keeps at
+    most max_size idle connections, closing the rest.
+
+    Idle connections are reused most-recently-released first, so a light load
+    keeps hitting the same warm connections. The first acquire() also opens
+    min_size connections up front (not at import, when the database file may
+    not exist yet).
+
+    Connections handed out by the pool return to it on conn.close(), so code
+    written for plain sqlite3 connections works unchanged. Prefer
+    `with pool.connection() as conn:` in new code.
+    """
+
+    def __init__(self, path, max_size=10, read_only=False, min_size=2):
+        self.path = path
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.read_only = read_only
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._seeded = False
+
+    def _seed(self):
+        """Open min_size idle connections"""
+        self._seeded = True
+        for _ in range(self.min_size - self._idle.qsize()):
+            conn = _open_connection(self.path, self.read_only)
+            conn.pool = self
+            conn.checked_out = False
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.pool = None
+                conn.close()
+                break
+
+    def acquire(self):
+        """Check out a connection"""
+        if not self._seeded:
+            self._seed()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = _open_connection(self.path, self.read_only)
+            conn.pool = self
+        conn.checked_out = True
+        conn.changes_at_checkout = conn.total_changes
+        return conn
+
+    def release(self, conn):
+        """Return a connection; any open transaction is rolled back"""
+        if not getattr(conn, 'checked_out', False):
+            return  # already released
+        conn.checked_out = False
+        wrote = conn.total_changes != conn.changes_at_checkout
+        if wrote:
+            _clear_request_memo()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            if wrote:
+                _optimize_after_writes(conn)
+            conn.row_factory = sqlite3.Row
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            conn.pool = None
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+_db_pool = ConnectionPool(DATABASE_PATH)
+_inventory_pool = ConnectionPool(INVENTORY_DB_PATH)
+# Read-only connections for query-only functions; under WAL any number of them
+# read alongside the single writer
+_inventory_read_pool = ConnectionPool(INVENTORY_DB_PATH, max_size=os.cpu_count() or 4,
+                                      read_only=True)
+
+def get_db_connection():
+    return _db_pool.acquire()
+
 def get_inventory_db_connection():
-    conn = sqlite3.connect(INVENTORY_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _inventory_pool.acquire()
+
+def db_connection():
+    """Context manager yielding a pooled users database connection"""
+    return _db_pool.connection()
+
+def inventory_db_connection():
+    """Context manager yielding a pooled inventory database connection"""
+    return _inventory_pool.connection()
+
+def inventory_read_connection():
+    """Context manager yielding a pooled read-only inventory database connection"""
+    return _inventory_read_pool.connection()
+
+# Long-lived connection used for all inventory writes. Writes are serialized by
+# the lock; readers use pooled connections, which WAL lets run alongside the
+# writer.
+_inventory_writer = None
+_inventory_writer_lock = threading.RLock()
+
+def get_inventory_writer():
+    """Return the shared inventory writer connection (hold the writer lock while using it)"""
+    global _inventory_writer
+    if _inventory_writer is None:
+        _inventory_writer = _open_connection(INVENTORY_DB_PATH)
+    return _inventory_writer
+
+@contextmanager
+def inventory_write_connection():
+    """
+    Lock and yield the shared inventory writer connection.
+
+    A transaction left open when the block exits (early return or error)
+    is rolled back so the next writer starts clean.
+    """
+    with _inventory_writer_lock:
+        conn = get_inventory_writer()
+        changes_before = conn.total_changes
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if conn.total_changes != changes_before:
+                _clear_request_memo()
+                _optimize_after_writes(conn)
 
 def init_database():
     conn = get_db_connection()
@@ -111,6 +406,17 @@ def init_database():
         )
     ''')
 
+    # Serves the newest-first ORDER BY (created_at, then id) and keyset pagination
+    # in get_activity_logs; the rowid id is implicitly the last index column
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON activity_logs(created_at)')
+
+    # Covering index for get_activity_log_stats and get_distinct_log_values,
+    # which can then be answered from the index without reading log rows
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_logs_stats
+        ON activity_logs(action_type, target_type, username, is_reverted)
+    ''')
+
     # Create system_settings table for global application settings
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS system_settings (
@@ -149,7 +455,7 @@ def init_database():
         if cursor.fetchone()[0] == 0:
             cursor.execute(
                 "INSERT INTO role_permissions (role, allowed_pages) VALUES (?, ?)",
-                (role, json.dumps(pages))
+                (role, _json_dumps(pages))
             )
 
     cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'")
@@ -164,6 +470,7 @@ def init_database():
     conn.close()
     print("Database initialized successfully.")
 
+@request_memoize
 def get_user_by_username(username):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -172,6 +479,13 @@ def get_user_by_username(username):
     conn.close()
     return user
 
+@request_memoize
+def get_user_role(username):
+    """Return the user's role, or None if the user does not exist"""
+    with db_connection() as conn:
+        row = conn.execute("SELECT role FROM users WHERE username = ?", (username,)).fetchone()
+    return row[0] if row else None
+
 def verify_user_password(username, password):
     user = get_user_by_username(username)
     if user and check_password_hash(user['password'], password):
@@ -556,6 +870,43 @@ def init_inventory_database():
         except:
             pass
 
+    # Availability state, kept in step with is_reserved/is_assigned by the triggers
+    # below: 0 = free, 1 = reserved, 2 = assigned, 3 = both
+    if 'state' not in inv_columns:
+        try:
+            cursor.execute("ALTER TABLE inventory ADD COLUMN state INTEGER NOT NULL DEFAULT 0")
+        except:
+            pass
+    # Backfill on every start, not only when the column is added, so a backfill
+    # interrupted by a crash is completed next time; a no-op once consistent.
+    # Committed straight away so it never depends on the rest of the init.
+    cursor.execute("""
+        UPDATE inventory
+        SET state = (COALESCE(is_reserved, 0) != 0) + 2 * (COALESCE(is_assigned, 0) != 0)
+        WHERE state != (COALESCE(is_reserved, 0) != 0) + 2 * (COALESCE(is_assigned, 0) != 0)
+    """)
+    conn.commit()
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_state_insert
+        AFTER INSERT ON inventory
+        WHEN NEW.state != (COALESCE(NEW.is_reserved, 0) != 0) + 2 * (COALESCE(NEW.is_assigned, 0) != 0)
+        BEGIN
+            UPDATE inventory
+            SET state = (COALESCE(NEW.is_reserved, 0) != 0) + 2 * (COALESCE(NEW.is_assigned, 0) != 0)
+            WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_state_update
+        AFTER UPDATE OF is_reserved, is_assigned ON inventory
+        WHEN NEW.state != (COALESCE(NEW.is_reserved, 0) != 0) + 2 * (COALESCE(NEW.is_assigned, 0) != 0)
+        BEGIN
+            UPDATE inventory
+            SET state = (COALESCE(NEW.is_reserved, 0) != 0) + 2 * (COALESCE(NEW.is_assigned, 0) != 0)
+            WHERE id = NEW.id;
+        END
+    ''')
+
     # Create trade_criteria table for generic buy/sell positions
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS trade_criteria (
@@ -669,51 +1020,142 @@ def init_inventory_database():
         )
     ''')
 
+    # Indexes for trade lookups (serial columns are already indexed by their UNIQUE constraints)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_inv_trade ON inventory(trade_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_warr_buy_tid ON warranties(buy_tradeid)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_warr_sell_tid ON warranties(sell_tradeid)')
+    # Partial index so get_unassigned_inventory reads only unassigned rows, already in id order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inv_unassigned ON inventory(id)
+        WHERE is_assigned = 0 OR is_assigned IS NULL
+    ''')
+    # Criteria searches (get_inventory_by_criteria) almost always filter on market,
+    # usually together with registry/product and a vintage range
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inv_criteria
+        ON inventory(market, registry, product, vintage)
+    ''')
+    # Availability filters of get_inventory_by_criteria; with state = 0 the rows
+    # also come out in its ORDER BY vintage, serial order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_inv_state_vintage ON inventory(state, vintage, serial)')
+    # Criteria claim lookups (get_available_after_criteria_claims) on available items
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inv_available_filter
+        ON inventory(state, registry, product, vintage)
+    ''')
+    # Reserved items by trade (get_reserved_inventory, get_reservation_summary).
+    # Carrying is_reserved makes it covering for the summary's grouped count.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inv_reserved_trade
+        ON inventory(reserved_for_trade_id, is_reserved)
+        WHERE is_reserved = 1
+    ''')
+    # Per-trade criteria maintenance (update_criteria_quantity, assign_criteria_only,
+    # remove_trade_criteria, get_trade_criteria); id keeps the FIFO order in the index
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tc_trade_dir_status
+        ON trade_criteria(trade_id, direction, status, id)
+    ''')
+    # Criteria-only allocation checks read the open sell criteria oldest first
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tc_status_created
+        ON trade_criteria(status, direction, created_at)
+    ''')
+    # Active reservations are released/delivered by serial and released in bulk
+    # when their criteria is cancelled; history rows stay out of both indexes
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_res_active_serial
+        ON inventory_reservations(serial)
+        WHERE status = 'active'
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_res_active_criteria
+        ON inventory_reservations(criteria_id)
+        WHERE status = 'active'
+    ''')
+
+    # Change counter for the criteria allocation inputs. Triggers bump it on any
+    # change that can affect get_criteria_allocation_status, which reuses its
+    # precomputed matches while the counter stays the same.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('allocation', 0)")
+    for table, event in (('inventory', 'INSERT'), ('inventory', 'DELETE'),
+                         ('inventory', 'UPDATE OF market, registry, product, project_type, protocol, '
+                                       'project_id, vintage, serial, state'),
+                         ('trade_criteria', 'INSERT'), ('trade_criteria', 'DELETE'),
+                         ('trade_criteria', 'UPDATE')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.split()[0].lower()}_allocation_version
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'allocation';
+            END
+        ''')
+
+    # Gather planner statistics once so the optional-filter queries pick
+    # sensible indexes; afterwards the stats are only refreshed on request
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cursor.fetchone() is None:
+        cursor.execute("ANALYZE")
+
     conn.commit()
     conn.close()
     print("Inventory database initialized successfully.")
 
+def _inv_row_to_item(r):
+    """
+    Convert an inventory tuple to the full item dict used by the inventory views.
+
+    The row must carry the columns id, market, registry, product, project_id,
+    project_type, protocol, project_name, vintage, serial, is_custody,
+    is_assigned, trade_id, is_reserved, reserved_for_trade_id in that order.
+    """
+    return {
+        '_row_index': r[0],
+        'Market': r[1] or '',
+        'Registry': r[2] or '',
+        'Product': r[3] or '',
+        'ProjectID': r[4] or '',
+        'ProjectType': r[5] or '',
+        'Protocol': r[6] or '',
+        'ProjectName': r[7] or '',
+        'Vintage': r[8] or '',
+        'Serial': r[9] or '',
+        'IsCustody': r[10] or '',
+        'IsAssigned': 'True' if r[11] else 'False',
+        'TradeID': r[12] or '',
+        'IsReserved': 'True' if r[13] else 'False',
+        'ReservedForTradeID': r[14] or ''
+    }
+
+_ALL_INVENTORY_ITEMS_SQL = """
+    SELECT id, market, registry, product, project_id, project_type,
+           protocol, project_name, vintage, serial, is_custody,
+           is_assigned, trade_id, is_reserved, reserved_for_trade_id
+    FROM inventory
+    ORDER BY id
+"""
+
 def get_all_inventory_items():
     """Get all inventory items from individual columns"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, market, registry, product, project_id, project_type,
-                   protocol, project_name, vintage, serial, is_custody,
-                   is_assigned, trade_id, is_reserved, reserved_for_trade_id
-            FROM inventory
-            ORDER BY id
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-
-        items = []
-        for row in rows:
-            item_data = {
-                '_row_index': row['id'],
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'Serial': row['serial'] or '',
-                'IsCustody': row['is_custody'] or '',
-                'IsAssigned': 'True' if row['is_assigned'] else 'False',
-                'TradeID': row['trade_id'] or '',
-                'IsReserved': 'True' if row['is_reserved'] else 'False',
-                'ReservedForTradeID': row['reserved_for_trade_id'] or ''
-            }
-            items.append(item_data)
+        with inventory_db_connection() as conn:
+            conn.row_factory = None  # plain tuples for _inv_row_to_item
+            cursor = conn.cursor()
+            cursor.execute(_ALL_INVENTORY_ITEMS_SQL)
+            rows = cursor.fetchall()
 
-        return items
+        return [_inv_row_to_item(r) for r in rows]
     except Exception as e:
         print(f"Error getting inventory items: {e}")
         return []
 
+
 def get_inventory_headers():
     """Get all unique headers from inventory items in specified order"""
     items = get_all_inventory_items()
@@ -760,57 +1202,55 @@ def get_inventory_headers():
 def add_inventory_item(item_data):
     """Add a new inventory item and automatically create corresponding warranty"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Remove _row_index if present
-        clean_data = {k: v for k, v in item_data.items() if k != '_row_index'}
+            # Remove _row_index if present
+            clean_data = {k: v for k, v in item_data.items() if k != '_row_index'}
 
-        # Get Serial for warranty creation
-        serial = clean_data.get('Serial', '')
+            # Get Serial for warranty creation
+            serial = clean_data.get('Serial', '')
 
-        # Handle IsAssigned - convert string to integer
-        is_assigned_str = clean_data.get('IsAssigned', 'False')
-        is_assigned = 1 if is_assigned_str in ['True', 'true', '1', True] else 0
+            # Handle IsAssigned - convert string to integer
+            is_assigned_str = clean_data.get('IsAssigned', 'False')
+            is_assigned = 1 if is_assigned_str in _TRUTHY else 0
 
-        # Insert into individual columns
-        cursor.execute("""
-            INSERT INTO inventory (market, registry, product, project_id, project_type,
-                                 protocol, project_name, vintage, serial, is_custody,
-                                 is_assigned, trade_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            clean_data.get('Market', ''),
-            clean_data.get('Registry', ''),
-            clean_data.get('Product', ''),
-            clean_data.get('ProjectID', ''),
-            clean_data.get('ProjectType', ''),
-            clean_data.get('Protocol', ''),
-            clean_data.get('ProjectName', ''),
-            clean_data.get('Vintage', ''),
-            clean_data.get('Serial', ''),
-            clean_data.get('IsCustody', ''),
-            is_assigned,
-            clean_data.get('TradeID', '')
-        ))
+            # Insert into individual columns
+            cursor.execute("""
+                INSERT INTO inventory (market, registry, product, project_id, project_type,
+                                     protocol, project_name, vintage, serial, is_custody,
+                                     is_assigned, trade_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                clean_data.get('Market', ''),
+                clean_data.get('Registry', ''),
+                clean_data.get('Product', ''),
+                clean_data.get('ProjectID', ''),
+                clean_data.get('ProjectType', ''),
+                clean_data.get('Protocol', ''),
+                clean_data.get('ProjectName', ''),
+                clean_data.get('Vintage', ''),
+                clean_data.get('Serial', ''),
+                clean_data.get('IsCustody', ''),
+                is_assigned,
+                clean_data.get('TradeID', '')
+            ))
 
-        item_id = cursor.lastrowid
+            item_id = cursor.lastrowid
 
-        # Automatically create warranty record for one-to-one relationship
-        if serial:
-            try:
-                cursor.execute(
-                    "INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (serial, '', '', '', '', None, None, '', '')
-                )
-            except Exception as warranty_error:
-                # If warranty creation fails, rollback inventory insert
-                conn.rollback()
-                conn.close()
-                return False, f"Failed to create warranty: {warranty_error}"
+            # Automatically create warranty record for one-to-one relationship
+            if serial:
+                try:
+                    cursor.execute(
+                        "INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (serial, '', '', '', '', None, None, '', '')
+                    )
+                except Exception as warranty_error:
+                    # If warranty creation fails, rollback inventory insert
+                    conn.rollback()
+                    return False, f"Failed to create warranty: {warranty_error}"
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         return True, item_id
     except Exception as e:
@@ -819,61 +1259,59 @@ def add_inventory_item(item_data):
 def update_inventory_item(item_id, item_data):
     """Update an inventory item and CASCADE serial changes to warranties"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Remove _row_index if present
-        clean_data = {k: v for k, v in item_data.items() if k != '_row_index'}
+            # Remove _row_index if present
+            clean_data = {k: v for k, v in item_data.items() if k != '_row_index'}
 
-        # Get the old serial before updating
-        cursor.execute("SELECT serial FROM inventory WHERE id = ?", (item_id,))
-        row = cursor.fetchone()
+            # Get the old serial before updating
+            cursor.execute("SELECT serial FROM inventory WHERE id = ?", (item_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            conn.close()
-            return False, "Item not found"
+            if not row:
+                return False, "Item not found"
 
-        old_serial = row['serial'] or ''
-        new_serial = clean_data.get('Serial', '')
+            old_serial = row['serial'] or ''
+            new_serial = clean_data.get('Serial', '')
 
-        # Handle IsAssigned - convert string to integer
-        is_assigned_str = clean_data.get('IsAssigned', 'False')
-        is_assigned = 1 if is_assigned_str in ['True', 'true', '1', True] else 0
+            # Handle IsAssigned - convert string to integer
+            is_assigned_str = clean_data.get('IsAssigned', 'False')
+            is_assigned = 1 if is_assigned_str in _TRUTHY else 0
 
-        # Update individual columns
-        cursor.execute("""
-            UPDATE inventory
-            SET market = ?, registry = ?, product = ?, project_id = ?, project_type = ?,
-                protocol = ?, project_name = ?, vintage = ?, serial = ?, is_custody = ?,
-                is_assigned = ?, trade_id = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (
-            clean_data.get('Market', ''),
-            clean_data.get('Registry', ''),
-            clean_data.get('Product', ''),
-            clean_data.get('ProjectID', ''),
-            clean_data.get('ProjectType', ''),
-            clean_data.get('Protocol', ''),
-            clean_data.get('ProjectName', ''),
-            clean_data.get('Vintage', ''),
-            new_serial,
-            clean_data.get('IsCustody', ''),
-            is_assigned,
-            clean_data.get('TradeID', ''),
-            item_id
-        ))
+            # Update individual columns
+            cursor.execute("""
+                UPDATE inventory
+                SET market = ?, registry = ?, product = ?, project_id = ?, project_type = ?,
+                    protocol = ?, project_name = ?, vintage = ?, serial = ?, is_custody = ?,
+                    is_assigned = ?, trade_id = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (
+                clean_data.get('Market', ''),
+                clean_data.get('Registry', ''),
+                clean_data.get('Product', ''),
+                clean_data.get('ProjectID', ''),
+                clean_data.get('ProjectType', ''),
+                clean_data.get('Protocol', ''),
+                clean_data.get('ProjectName', ''),
+                clean_data.get('Vintage', ''),
+                new_serial,
+                clean_data.get('IsCustody', ''),
+                is_assigned,
+                clean_data.get('TradeID', ''),
+                item_id
+            ))
 
-        # If serial changed, update the corresponding warranty's serial (CASCADE)
-        if old_serial != new_serial and old_serial:
-            cursor.execute(
-                "UPDATE warranties SET serial = ? WHERE serial = ?",
-                (new_serial, old_serial)
-            )
+            # If serial changed, update the corresponding warranty's serial (CASCADE)
+            if old_serial != new_serial and old_serial:
+                cursor.execute(
+                    "UPDATE warranties SET serial = ? WHERE serial = ?",
+                    (new_serial, old_serial)
+                )
 
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+            conn.commit()
+            affected = cursor.rowcount
 
         if affected == 0:
             return False, "Item not found"
@@ -884,29 +1322,27 @@ def update_inventory_item(item_id, item_data):
 def delete_inventory_item(item_id):
     """Delete an inventory item and its corresponding warranty"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get Serial before deleting inventory
-        cursor.execute("SELECT serial FROM inventory WHERE id = ?", (item_id,))
-        row = cursor.fetchone()
+            # Get Serial before deleting inventory
+            cursor.execute("SELECT serial FROM inventory WHERE id = ?", (item_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            conn.close()
-            return False, "Item not found"
+            if not row:
+                return False, "Item not found"
 
-        serial = row['serial'] or ''
+            serial = row['serial'] or ''
 
-        # Delete inventory item
-        cursor.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
-        affected = cursor.rowcount
+            # Delete inventory item
+            cursor.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+            affected = cursor.rowcount
 
-        # Delete corresponding warranty to maintain one-to-one relationship
-        if serial:
-            cursor.execute("DELETE FROM warranties WHERE serial = ?", (serial,))
+            # Delete corresponding warranty to maintain one-to-one relationship
+            if serial:
+                cursor.execute("DELETE FROM warranties WHERE serial = ?", (serial,))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         if affected == 0:
             return False, "Item not found"
@@ -914,146 +1350,208 @@ def delete_inventory_item(item_id):
     except Exception as e:
         return False, str(e)
 
+# Change counters of the writer connection as of the last backup, plus that
+# backup's id, username and action. PRAGMA data_version (commits by other
+# connections) and total_changes (commits by the writer) are per-connection,
+# so this is kept in memory rather than stored with the backup row.
+_last_backup_state = None
+
 def create_inventory_backup(username, action, summary=None):
-    """Create a backup snapshot of the entire inventory including warranties"""
+    """
+    Create a backup snapshot of the entire inventory including warranties.
+
+    If nothing has been written since the previous backup and it was taken by
+    the same user for the same action, that backup's ID is returned instead of
+    writing an identical snapshot.
+    """
+    global _last_backup_state
+
     # Check if backup tracking is enabled
     if not is_backup_tracking_enabled():
         return True, None  # Silently skip backup when paused
 
     try:
-        # Get all current inventory data
-        items = get_all_inventory_items()
-
-        # Get all warranty data
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM warranties")
-        warranty_rows = cursor.fetchall()
-        warranties = [dict(row) for row in warranty_rows]
+        # The writer lock is held only to read the change counters and to insert
+        # the backup row, so request-path writes aren't blocked while the
+        # snapshot is read and encoded
+        with inventory_write_connection() as conn:
+            counters = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+            if _last_backup_state is not None:
+                last_version, last_changes, last_id, last_username, last_action = _last_backup_state
+                if (last_version, last_changes, last_username, last_action) == counters + (username, action):
+                    return True, last_id
+
+        # Read inventory and warranties in one read transaction so they match
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.row_factory = None  # plain tuples for _inv_row_to_item
+            items = [_inv_row_to_item(r) for r in cursor.execute(_ALL_INVENTORY_ITEMS_SQL)]
+            cursor.row_factory = sqlite3.Row
+            warranties = [dict(row) for row in cursor.execute("SELECT * FROM warranties")]
+            conn.rollback()
 
         # Combine inventory and warranty data
-        backup_data = {
+        backup_data = _json_dumps({
             'inventory': items,
             'warranties': warranties
-        }
+        })
 
-        cursor.execute(
-            "INSERT INTO inventory_backups (username, action, summary, backup_data) VALUES (?, ?, ?, ?)",
-            (username, action, json.dumps(summary) if summary else None, json.dumps(backup_data))
-        )
+        with inventory_write_connection() as conn:
+            unchanged = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes) == counters
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO inventory_backups (username, action, summary, backup_data) VALUES (?, ?, ?, ?)",
+                (username, action, _json_dumps(summary) if summary else None, backup_data)
+            )
 
-        conn.commit()
-        backup_id = cursor.lastrowid
-        conn.close()
+            conn.commit()
+            backup_id = cursor.lastrowid
+            # Only vouch for the snapshot matching the current data if nothing
+            # was written while it was being read
+            if unchanged:
+                _last_backup_state = (counters[0], conn.total_changes, backup_id, username, action)
+            else:
+                _last_backup_state = None
 
         return True, backup_id
     except Exception as e:
         return False, str(e)
 
-def get_all_inventory_backups():
-    """Get all inventory backups with metadata"""
-    try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, username, action, summary, created_at
-            FROM inventory_backups
-            ORDER BY created_at DESC
-        """)
-        backups = cursor.fetchall()
-        conn.close()
+# Single worker so queued backups are written one at a time, in order
+_backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inventory-backup')
 
-        result = []
-        for backup in backups:
-            backup_dict = dict(backup)
-            if backup_dict['summary']:
-                backup_dict['summary'] = json.loads(backup_dict['summary'])
-            result.append(backup_dict)
+def _run_inventory_backup(username, action, summary):
+    success, result = create_inventory_backup(username, action, summary)
+    if not success:
+        print(f"Error creating inventory backup: {result}")
 
-        return result
-    except Exception as e:
-        print(f"Error getting backups: {e}")
-        return []
+def create_inventory_backup_async(username, action, summary=None):
+    """
+    Queue an inventory backup on the background backup thread and return immediately.
+
+    Use for snapshots taken after a change, where the caller does not need the
+    backup ID. Backups that must exist before a destructive operation should
+    call create_inventory_backup() directly.
+
+    Returns:
+        concurrent.futures.Future for the queued backup
+    """
+    return _backup_executor.submit(_run_inventory_backup, username, action, summary)
+
+# created_at is stored in UTC; shift it to US Eastern inside SQLite using the
+# US DST window (second Sunday of March 07:00 UTC to first Sunday of November
+# 06:00 UTC) so the result does not depend on the server's TZ setting.
+_EASTERN_OFFSET_SQL = """
+    CASE WHEN created_at >= datetime(created_at, 'start of year', '+2 months', 'weekday 0', '+7 days', '+7 hours')
+          AND created_at < datetime(created_at, 'start of year', '+10 months', 'weekday 0', '+6 hours')
+         THEN '-4 hours' ELSE '-5 hours' END
+"""
+
+_BACKUPS_GROUPED_SQL = f"""
+    SELECT id, username, action, summary, created_at,
+           COALESCE(date(local_at), 'Unknown') AS date_only,
+           COALESCE(printf('%02d', (CAST(strftime('%H', local_at) AS INTEGER) + 11) % 12 + 1)
+                    || strftime(':%M:%S ', local_at)
+                    || CASE WHEN strftime('%H', local_at) < '12' THEN 'AM' ELSE 'PM' END,
+                    created_at) AS time_only
+    FROM (
+        SELECT id, username, action, summary, created_at,
+               datetime(created_at, {_EASTERN_OFFSET_SQL}) AS local_at
+        FROM inventory_backups
+    )
+    ORDER BY date_only DESC, id DESC
+"""
+
+def iter_inventory_backups_grouped(chunk_size=500):
+    """
+    Yield all inventory backups with their US Eastern date and time already
+    computed, ordered by Eastern date (newest first) then ID (newest first),
+    reading chunk_size rows at a time.
+
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    with inventory_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_BACKUPS_GROUPED_SQL)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                backup_dict = dict(row)
+                if backup_dict['summary']:
+                    backup_dict['summary'] = _json_loads(backup_dict['summary'])
+                yield backup_dict
 
 def restore_inventory_backup(backup_id):
     """Restore inventory and warranties from a backup snapshot"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get the backup data
-        cursor.execute("SELECT backup_data FROM inventory_backups WHERE id = ?", (backup_id,))
-        row = cursor.fetchone()
+            # Get the backup data
+            cursor.execute("SELECT backup_data FROM inventory_backups WHERE id = ?", (backup_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            conn.close()
-            return False, "Backup not found"
+            if not row:
+                return False, "Backup not found"
 
-        backup_data = json.loads(row['backup_data'])
+            backup_data = _json_loads(row['backup_data'])
 
-        # Handle both old format (list) and new format (dict with inventory/warranties)
-        if isinstance(backup_data, list):
-            # Old format - just inventory items
-            backup_items = backup_data
-            backup_warranties = []
-        else:
-            # New format - dict with inventory and warranties
-            backup_items = backup_data.get('inventory', [])
-            backup_warranties = backup_data.get('warranties', [])
+            # Handle both old format (list) and new format (dict with inventory/warranties)
+            if isinstance(backup_data, list):
+                # Old format - just inventory items
+                backup_items = backup_data
+                backup_warranties = []
+            else:
+                # New format - dict with inventory and warranties
+                backup_items = backup_data.get('inventory', [])
+                backup_warranties = backup_data.get('warranties', [])
 
-        # Clear current inventory and warranties
-        cursor.execute("DELETE FROM warranties")
-        cursor.execute("DELETE FROM inventory")
+            # Clear current inventory and warranties
+            cursor.execute("DELETE FROM warranties")
+            cursor.execute("DELETE FROM inventory")
 
-        # Restore inventory items from backup
-        for item in backup_items:
-            clean_data = {k: v for k, v in item.items() if k != '_row_index'}
-            # Handle IsAssigned - convert string to integer
-            is_assigned_str = clean_data.get('IsAssigned', 'False')
-            is_assigned = 1 if is_assigned_str in ['True', 'true', '1', True] else 0
-            cursor.execute("""
+            # Restore inventory items from backup (rows are generated one at a time)
+            cursor.executemany("""
                 INSERT INTO inventory (market, registry, product, project_id, project_type,
                                      protocol, project_name, vintage, serial, is_custody,
                                      is_assigned, trade_id)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                clean_data.get('Market', ''),
-                clean_data.get('Registry', ''),
-                clean_data.get('Product', ''),
-                clean_data.get('ProjectID', ''),
-                clean_data.get('ProjectType', ''),
-                clean_data.get('Protocol', ''),
-                clean_data.get('ProjectName', ''),
-                clean_data.get('Vintage', ''),
-                clean_data.get('Serial', ''),
-                clean_data.get('IsCustody', ''),
-                is_assigned,
-                clean_data.get('TradeID', '')
-            ))
+            """, ((
+                item.get('Market', ''),
+                item.get('Registry', ''),
+                item.get('Product', ''),
+                item.get('ProjectID', ''),
+                item.get('ProjectType', ''),
+                item.get('Protocol', ''),
+                item.get('ProjectName', ''),
+                item.get('Vintage', ''),
+                item.get('Serial', ''),
+                item.get('IsCustody', ''),
+                1 if item.get('IsAssigned', 'False') in _TRUTHY else 0,
+                item.get('TradeID', '')
+            ) for item in backup_items))
+
+            # Restore warranty items from backup, skipping rows without a serial
+            cursor.executemany("""
+                INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end,
+                                      buy_tradeid, sell_tradeid, buy_client, sell_client)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, ((
+                warranty.get('serial', ''),
+                warranty.get('buy_start', ''),
+                warranty.get('buy_end', ''),
+                warranty.get('sell_start', ''),
+                warranty.get('sell_end', ''),
+                warranty.get('buy_tradeid'),
+                warranty.get('sell_tradeid'),
+                warranty.get('buy_client', ''),
+                warranty.get('sell_client', '')
+            ) for warranty in backup_warranties if warranty.get('serial')))
 
-        # Restore warranty items from backup
-        for warranty in backup_warranties:
-            # Skip internal fields
-            clean_warranty = {k: v for k, v in warranty.items() if k not in ['id', 'created_at', 'updated_at']}
-            if clean_warranty.get('serial'):
-                cursor.execute("""
-                    INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end,
-                                          buy_tradeid, sell_tradeid, buy_client, sell_client)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    clean_warranty.get('serial', ''),
-                    clean_warranty.get('buy_start', ''),
-                    clean_warranty.get('buy_end', ''),
-                    clean_warranty.get('sell_start', ''),
-                    clean_warranty.get('sell_end', ''),
-                    clean_warranty.get('buy_tradeid'),
-                    clean_warranty.get('sell_tradeid'),
-                    clean_warranty.get('buy_client', ''),
-                    clean_warranty.get('sell_client', '')
-                ))
-
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         return True, "Backup restored successfully"
     except Exception as e:
@@ -1062,14 +1560,13 @@ def restore_inventory_backup(backup_id):
 def delete_inventory_backup(backup_id):
     """Delete a specific backup"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("DELETE FROM inventory_backups WHERE id = ?", (backup_id,))
+            cursor.execute("DELETE FROM inventory_backups WHERE id = ?", (backup_id,))
 
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+            conn.commit()
+            affected = cursor.rowcount
 
         if affected == 0:
             return False, "Backup not found"
@@ -1077,6 +1574,28 @@ def delete_inventory_backup(backup_id):
     except Exception as e:
         return False, str(e)
 
+def delete_inventory_backups_by_date(date_str):
+    """
+    Delete all backups created on a given date in a single statement.
+
+    Args:
+        date_str: Date in 'YYYY-MM-DD' format, compared against created_at
+
+    Returns:
+        Tuple of (success, deleted_count or error message)
+    """
+    try:
+        with inventory_write_connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM inventory_backups WHERE date(created_at) = ?", (date_str,)
+            )
+            conn.commit()
+            deleted_count = cursor.rowcount
+
+        return True, deleted_count
+    except Exception as e:
+        return False, str(e)
+
 def migrate_csv_to_database(csv_file_path):
     """Migrate existing CSV data to database"""
     import csv
@@ -1097,10 +1616,44 @@ def migrate_csv_to_database(csv_file_path):
 
 # Warranty Management Functions
 
+def _to_int_or_none(value):
+    """Convert a TradeID value to int; empty or non-numeric values become None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int) or (isinstance(value, str) and value.isdecimal()):
+        return int(value)
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+# Column order for warranty items (keys built by get_all_warranty_items, minus _row_index)
+WARRANTY_HEADERS = (
+    'Market',
+    'Registry',
+    'Product',
+    'ProjectID',
+    'ProjectType',
+    'Protocol',
+    'ProjectName',
+    'Vintage',
+    'IsCustody',
+    'Serial',
+    'Buy_Start',
+    'Buy_End',
+    'Buy_TradeID',
+    'Buy_Client',
+    'Sell_Start',
+    'Sell_End',
+    'Sell_TradeID',
+    'Sell_Client'
+)
+
 def get_all_warranty_items():
     """Get all warranty items by joining with inventory on Serial"""
     try:
         conn = get_inventory_db_connection()
+        conn.row_factory = None  # plain tuples, unpacked positionally below
         cursor = conn.cursor()
 
         # Join warranties with inventory on Serial
@@ -1129,35 +1682,34 @@ def get_all_warranty_items():
             LEFT JOIN inventory i ON i.serial = w.serial
             ORDER BY w.id
         """)
-        rows = cursor.fetchall()
-        conn.close()
 
         items = []
-        for row in rows:
+        for (row_id, serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid,
+             buy_client, sell_client, market, registry, product, project_id, project_type,
+             protocol, project_name, vintage, is_custody) in cursor:
             # Combine warranty and inventory data
-            item_data = {
-                '_row_index': row['id'],
-                'Serial': row['serial'],
-                'Buy_Start': row['buy_start'] or '',
-                'Buy_End': row['buy_end'] or '',
-                'Sell_Start': row['sell_start'] or '',
-                'Sell_End': row['sell_end'] or '',
-                'Buy_TradeID': row['buy_tradeid'] if row['buy_tradeid'] is not None else '',
-                'Sell_TradeID': row['sell_tradeid'] if row['sell_tradeid'] is not None else '',
-                'Buy_Client': row['buy_client'] or '',
-                'Sell_Client': row['sell_client'] or '',
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'IsCustody': row['is_custody'] or ''
-            }
-
-            items.append(item_data)
+            items.append({
+                '_row_index': row_id,
+                'Serial': serial,
+                'Buy_Start': buy_start or '',
+                'Buy_End': buy_end or '',
+                'Sell_Start': sell_start or '',
+                'Sell_End': sell_end or '',
+                'Buy_TradeID': buy_tradeid if buy_tradeid is not None else '',
+                'Sell_TradeID': sell_tradeid if sell_tradeid is not None else '',
+                'Buy_Client': buy_client or '',
+                'Sell_Client': sell_client or '',
+                'Market': market or '',
+                'Registry': registry or '',
+                'Product': product or '',
+                'ProjectID': project_id or '',
+                'ProjectType': project_type or '',
+                'Protocol': protocol or '',
+                'ProjectName': project_name or '',
+                'Vintage': vintage or '',
+                'IsCustody': is_custody or ''
+            })
+        conn.close()
 
         return items
     except Exception as e:
@@ -1165,111 +1717,50 @@ def get_all_warranty_items():
         return []
 
 def get_warranty_headers():
-    """Get all unique headers from warranty items in specified order"""
-    items = get_all_warranty_items()
-    if not items:
-        return []
+    """Get warranty headers in display order.
 
-    # Collect all unique keys across all items
-    headers_set = set()
-    for item in items:
-        for key in item.keys():
-            if key != '_row_index':
-                headers_set.add(key)
-
-    # Define preferred column order for warranties
-    preferred_order = [
-        'Market',
-        'Registry',
-        'Product',
-        'ProjectID',
-        'ProjectType',
-        'Protocol',
-        'ProjectName',
-        'Vintage',
-        'IsCustody',
-        'Serial',
-        'Buy_Start',
-        'Buy_End',
-        'Buy_TradeID',
-        'Buy_Client',
-        'Sell_Start',
-        'Sell_End',
-        'Sell_TradeID',
-        'Sell_Client'
-    ]
-
-    # Order headers according to preferred order
-    ordered_headers = []
-
-    # First, add headers that are in the preferred order
-    for header in preferred_order:
-        if header in headers_set:
-            ordered_headers.append(header)
-
-    # Then, add any additional headers that aren't in the preferred order (sorted)
-    remaining_headers = sorted([h for h in headers_set if h not in preferred_order])
-    ordered_headers.extend(remaining_headers)
-
-    return ordered_headers
+    The keys produced by get_all_warranty_items() are fixed, so there is no
+    need to load every warranty row just to rediscover them.
+    """
+    return list(WARRANTY_HEADERS)
 
 def add_warranty_item(item_data):
     """Add a new warranty item (only warranty fields: Serial, Buy_Start, Buy_End, Sell_Start, Sell_End, Buy_TradeID, Sell_TradeID, Buy_Client, Sell_Client)
     Validates that Serial exists in inventory to maintain one-to-one relationship"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        serial = item_data.get('Serial', '')
-        buy_start = item_data.get('Buy_Start', '')
-        buy_end = item_data.get('Buy_End', '')
-        sell_start = item_data.get('Sell_Start', '')
-        sell_end = item_data.get('Sell_End', '')
-        buy_tradeid = item_data.get('Buy_TradeID', None)
-        sell_tradeid = item_data.get('Sell_TradeID', None)
-        buy_client = item_data.get('Buy_Client', '')
-        sell_client = item_data.get('Sell_Client', '')
-
-        # Convert TradeIDs to int if they're non-empty strings
-        if buy_tradeid == '' or buy_tradeid is None:
-            buy_tradeid = None
-        else:
-            try:
-                buy_tradeid = int(buy_tradeid)
-            except (ValueError, TypeError):
-                buy_tradeid = None
-
-        if sell_tradeid == '' or sell_tradeid is None:
-            sell_tradeid = None
-        else:
-            try:
-                sell_tradeid = int(sell_tradeid)
-            except (ValueError, TypeError):
-                sell_tradeid = None
-
-        if not serial:
-            conn.close()
-            return False, "Serial is required"
-
-        # Validate that Serial exists in inventory (one-to-one relationship)
-        cursor.execute(
-            "SELECT COUNT(*) FROM inventory WHERE serial = ?",
-            (serial,)
-        )
-        count = cursor.fetchone()[0]
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+
+            serial = item_data.get('Serial', '')
+            buy_start = item_data.get('Buy_Start', '')
+            buy_end = item_data.get('Buy_End', '')
+            sell_start = item_data.get('Sell_Start', '')
+            sell_end = item_data.get('Sell_End', '')
+            buy_tradeid = _to_int_or_none(item_data.get('Buy_TradeID'))
+            sell_tradeid = _to_int_or_none(item_data.get('Sell_TradeID'))
+            buy_client = item_data.get('Buy_Client', '')
+            sell_client = item_data.get('Sell_Client', '')
+
+            if not serial:
+                return False, "Serial is required"
+
+            # Validate that Serial exists in inventory (one-to-one relationship)
+            cursor.execute(
+                "SELECT COUNT(*) FROM inventory WHERE serial = ?",
+                (serial,)
+            )
+            count = cursor.fetchone()[0]
 
-        if count == 0:
-            conn.close()
-            return False, f"Serial '{serial}' does not exist in inventory. Add inventory item first."
+            if count == 0:
+                return False, f"Serial '{serial}' does not exist in inventory. Add inventory item first."
 
-        cursor.execute(
-            "INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client)
-        )
+            cursor.execute(
+                "INSERT INTO warranties (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (serial, buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client)
+            )
 
-        conn.commit()
-        item_id = cursor.lastrowid
-        conn.close()
+            conn.commit()
+            item_id = cursor.lastrowid
 
         return True, item_id
     except Exception as e:
@@ -1278,44 +1769,26 @@ def add_warranty_item(item_data):
 def update_warranty_item(item_id, item_data):
     """Update a warranty item (only warranty fields can be updated: Buy_Start, Buy_End, Sell_Start, Sell_End, Buy_TradeID, Sell_TradeID, Buy_Client, Sell_Client)"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # Only update warranty fields, not Serial
-        buy_start = item_data.get('Buy_Start', '')
-        buy_end = item_data.get('Buy_End', '')
-        sell_start = item_data.get('Sell_Start', '')
-        sell_end = item_data.get('Sell_End', '')
-        buy_tradeid = item_data.get('Buy_TradeID', None)
-        sell_tradeid = item_data.get('Sell_TradeID', None)
-        buy_client = item_data.get('Buy_Client', '')
-        sell_client = item_data.get('Sell_Client', '')
-
-        # Convert TradeIDs to int if they're non-empty strings
-        if buy_tradeid == '' or buy_tradeid is None:
-            buy_tradeid = None
-        else:
-            try:
-                buy_tradeid = int(buy_tradeid)
-            except (ValueError, TypeError):
-                buy_tradeid = None
-
-        if sell_tradeid == '' or sell_tradeid is None:
-            sell_tradeid = None
-        else:
-            try:
-                sell_tradeid = int(sell_tradeid)
-            except (ValueError, TypeError):
-                sell_tradeid = None
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+
+            # Only update warranty fields, not Serial
+            buy_start = item_data.get('Buy_Start', '')
+            buy_end = item_data.get('Buy_End', '')
+            sell_start = item_data.get('Sell_Start', '')
+            sell_end = item_data.get('Sell_End', '')
+            buy_tradeid = _to_int_or_none(item_data.get('Buy_TradeID'))
+            sell_tradeid = _to_int_or_none(item_data.get('Sell_TradeID'))
+            buy_client = item_data.get('Buy_Client', '')
+            sell_client = item_data.get('Sell_Client', '')
 
-        cursor.execute(
-            "UPDATE warranties SET buy_start = ?, buy_end = ?, sell_start = ?, sell_end = ?, buy_tradeid = ?, sell_tradeid = ?, buy_client = ?, sell_client = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client, item_id)
-        )
+            cursor.execute(
+                "UPDATE warranties SET buy_start = ?, buy_end = ?, sell_start = ?, sell_end = ?, buy_tradeid = ?, sell_tradeid = ?, buy_client = ?, sell_client = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (buy_start, buy_end, sell_start, sell_end, buy_tradeid, sell_tradeid, buy_client, sell_client, item_id)
+            )
 
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+            conn.commit()
+            affected = cursor.rowcount
 
         if affected == 0:
             return False, "Item not found"
@@ -1326,32 +1799,30 @@ def update_warranty_item(item_id, item_data):
 def delete_warranty_item(item_id):
     """Delete a warranty item and its corresponding inventory item to maintain one-to-one relationship"""
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get Serial before deleting warranty
-        cursor.execute("SELECT serial FROM warranties WHERE id = ?", (item_id,))
-        row = cursor.fetchone()
+            # Get Serial before deleting warranty
+            cursor.execute("SELECT serial FROM warranties WHERE id = ?", (item_id,))
+            row = cursor.fetchone()
 
-        if not row:
-            conn.close()
-            return False, "Item not found"
+            if not row:
+                return False, "Item not found"
 
-        serial = row['serial']
+            serial = row['serial']
 
-        # Delete warranty
-        cursor.execute("DELETE FROM warranties WHERE id = ?", (item_id,))
-        affected = cursor.rowcount
+            # Delete warranty
+            cursor.execute("DELETE FROM warranties WHERE id = ?", (item_id,))
+            affected = cursor.rowcount
 
-        # Delete corresponding inventory item to maintain one-to-one relationship
-        if serial:
-            cursor.execute(
-                "DELETE FROM inventory WHERE json_extract(data, '$.Serial') = ?",
-                (serial,)
-            )
+            # Delete corresponding inventory item to maintain one-to-one relationship
+            if serial:
+                cursor.execute(
+                    "DELETE FROM inventory WHERE json_extract(data, '$.Serial') = ?",
+                    (serial,)
+                )
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         if affected == 0:
             return False, "Item not found"
@@ -1406,6 +1877,28 @@ def save_user_page_settings(username, page, settings):
 
 # Trade Assignment Functions
 
+@lru_cache(maxsize=256)
+def _criteria_snapshot_items(snapshot_json):
+    return tuple(_json_loads(snapshot_json).items())
+
+def parse_criteria_snapshot(snapshot_json):
+    """
+    Parse a stored criteria_snapshot JSON string.
+
+    Parsed snapshots are cached by their JSON text, so unassigning many items
+    taken from the same criteria only decodes it once. Each call returns a
+    fresh dict that the caller may modify.
+
+    Returns:
+        dict, or None if the snapshot is empty or not valid JSON
+    """
+    if not snapshot_json:
+        return None
+    try:
+        return dict(_criteria_snapshot_items(snapshot_json))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
 def assign_inventory_to_trade(serials, trade_id, warranty_data=None, criteria_id=None):
     """
     Assign inventory items to a trade by serial numbers.
@@ -1428,75 +1921,73 @@ def assign_inventory_to_trade(serials, trade_id, warranty_data=None, criteria_id
         (success, message, count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # If criteria_id is provided, fetch and store the criteria snapshot
-        criteria_snapshot_json = None
-        if criteria_id:
-            cursor.execute("""
-                SELECT id, trade_id, direction, quantity_required, market, registry, product,
-                       project_type, protocol, project_id, vintage_from, vintage_to, status
-                FROM trade_criteria
-                WHERE id = ?
-            """, (criteria_id,))
-            crit = cursor.fetchone()
-            if crit:
-                criteria_snapshot = {
-                    'trade_id': crit['trade_id'],
-                    'direction': crit['direction'],
-                    'market': crit['market'],
-                    'registry': crit['registry'],
-                    'product': crit['product'],
-                    'project_type': crit['project_type'],
-                    'protocol': crit['protocol'],
-                    'project_id': crit['project_id'],
-                    'vintage_from': crit['vintage_from'],
-                    'vintage_to': crit['vintage_to']
-                }
-                criteria_snapshot_json = json.dumps(criteria_snapshot)
+            # If criteria_id is provided, fetch and store the criteria snapshot
+            criteria_snapshot_json = None
+            if criteria_id:
+                cursor.execute("""
+                    SELECT id, trade_id, direction, quantity_required, market, registry, product,
+                           project_type, protocol, project_id, vintage_from, vintage_to, status
+                    FROM trade_criteria
+                    WHERE id = ?
+                """, (criteria_id,))
+                crit = cursor.fetchone()
+                if crit:
+                    criteria_snapshot = {
+                        'trade_id': crit['trade_id'],
+                        'direction': crit['direction'],
+                        'market': crit['market'],
+                        'registry': crit['registry'],
+                        'product': crit['product'],
+                        'project_type': crit['project_type'],
+                        'protocol': crit['protocol'],
+                        'project_id': crit['project_id'],
+                        'vintage_from': crit['vintage_from'],
+                        'vintage_to': crit['vintage_to']
+                    }
+                    criteria_snapshot_json = json.dumps(criteria_snapshot)
 
-        assigned_count = 0
+            # Serials are passed as one JSON array and expanded with json_each,
+            # so each table is updated with a single statement
+            serials_json = json.dumps(list(serials))
 
-        for serial in serials:
-            # Update inventory record with criteria_id and snapshot if provided
+            # Update inventory records with criteria_id and snapshot if provided
             cursor.execute("""
                 UPDATE inventory
                 SET is_assigned = 1, trade_id = ?, criteria_id = ?, criteria_snapshot = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE serial = ?
-            """, (trade_id, criteria_id, criteria_snapshot_json, serial))
+                WHERE serial IN (SELECT value FROM json_each(?))
+            """, (trade_id, criteria_id, criteria_snapshot_json, serials_json))
+            assigned_count = cursor.rowcount
 
-            if cursor.rowcount > 0:
-                assigned_count += 1
-
-                # Update warranty if warranty_data provided
-                if warranty_data:
-                    cursor.execute("""
-                        UPDATE warranties
-                        SET buy_start = COALESCE(?, buy_start),
-                            buy_end = COALESCE(?, buy_end),
-                            sell_start = COALESCE(?, sell_start),
-                            sell_end = COALESCE(?, sell_end),
-                            buy_tradeid = COALESCE(?, buy_tradeid),
-                            sell_tradeid = COALESCE(?, sell_tradeid),
-                            buy_client = COALESCE(?, buy_client),
-                            sell_client = COALESCE(?, sell_client),
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE serial = ?
-                    """, (
-                        warranty_data.get('buy_start'),
-                        warranty_data.get('buy_end'),
-                        warranty_data.get('sell_start'),
-                        warranty_data.get('sell_end'),
-                        trade_id if warranty_data.get('set_buy_tradeid') else None,
-                        trade_id if warranty_data.get('set_sell_tradeid') else None,
-                        warranty_data.get('buy_client'),
-                        warranty_data.get('sell_client'),
-                        serial
-                    ))
+            # Update warranties if warranty_data provided
+            if warranty_data and assigned_count > 0:
+                cursor.execute("""
+                    UPDATE warranties
+                    SET buy_start = COALESCE(?, buy_start),
+                        buy_end = COALESCE(?, buy_end),
+                        sell_start = COALESCE(?, sell_start),
+                        sell_end = COALESCE(?, sell_end),
+                        buy_tradeid = COALESCE(?, buy_tradeid),
+                        sell_tradeid = COALESCE(?, sell_tradeid),
+                        buy_client = COALESCE(?, buy_client),
+                        sell_client = COALESCE(?, sell_client),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE serial IN (SELECT value FROM json_each(?))
+                """, (
+                    warranty_data.get('buy_start'),
+                    warranty_data.get('buy_end'),
+                    warranty_data.get('sell_start'),
+                    warranty_data.get('sell_end'),
+                    trade_id if warranty_data.get('set_buy_tradeid') else None,
+                    trade_id if warranty_data.get('set_sell_tradeid') else None,
+                    warranty_data.get('buy_client'),
+                    warranty_data.get('sell_client'),
+                    serials_json
+                ))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         return True, f"Successfully assigned {assigned_count} item(s) to trade {trade_id}", assigned_count
     except Exception as e:
@@ -1516,25 +2007,33 @@ def unassign_inventory_from_trade(serials, username=None, restore_criteria=True)
         (success, message, count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # First, get criteria info for all serials BEFORE unassigning
-        criteria_to_restore = {}  # {criteria_id: {'count': N, 'snapshot': {...}}}
-
-        if restore_criteria:
-            for serial in serials:
-                cursor.execute("""
-                    SELECT criteria_id, trade_id, criteria_snapshot FROM inventory WHERE serial = ?
-                """, (serial,))
-                inv = cursor.fetchone()
-
-                if inv and inv['criteria_id']:
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+
+            # First, get criteria info for all serials BEFORE unassigning
+            criteria_to_restore = {}  # {criteria_id: {'count': N, 'snapshot': {...}}}
+
+            serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+
+            if restore_criteria:
+                inventory_rows = []
+                for batch in _batched(serials):
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(f"""
+                        SELECT serial, criteria_id, trade_id, criteria_snapshot
+                        FROM inventory
+                        WHERE serial IN ({placeholders})
+                    """, batch)
+                    inventory_rows.extend(cursor.fetchall())
+
+                looked_up = set()  # criteria ids already resolved (found, snapshot or neither)
+                for inv in inventory_rows:
                     criteria_id = inv['criteria_id']
-                    trade_id = inv['trade_id']
-                    stored_snapshot = inv['criteria_snapshot']
+                    if not criteria_id:
+                        continue
 
-                    if criteria_id not in criteria_to_restore:
+                    if criteria_id not in looked_up:
+                        looked_up.add(criteria_id)
                         # Get criteria details (may be deleted)
                         cursor.execute("""
                             SELECT id, trade_id, direction, quantity_required, market, registry, product,
@@ -1546,58 +2045,79 @@ def unassign_inventory_from_trade(serials, username=None, restore_criteria=True)
 
                         if crit:
                             # Criteria still exists - use current values
+                            snapshot_dict = dict(crit)
+                        else:
+                            # Criteria was deleted - use the stored snapshot from when it was assigned
+                            snapshot_dict = parse_criteria_snapshot(inv['criteria_snapshot'])
+
+                        if snapshot_dict is not None:
                             criteria_to_restore[criteria_id] = {
                                 'count': 0,
-                                'snapshot': dict(crit)
+                                'snapshot': snapshot_dict
                             }
-                        elif stored_snapshot:
-                            # Criteria was deleted - use the stored snapshot from when it was assigned
-                            try:
-                                snapshot_dict = json.loads(stored_snapshot)
-                                criteria_to_restore[criteria_id] = {
-                                    'count': 0,
-                                    'snapshot': snapshot_dict
-                                }
-                            except (json.JSONDecodeError, TypeError):
-                                pass  # Invalid snapshot, skip restoration
 
                     if criteria_id in criteria_to_restore:
                         criteria_to_restore[criteria_id]['count'] += 1
 
-        unassigned_count = 0
+            unassigned_count = 0
 
-        for serial in serials:
-            cursor.execute("""
-                UPDATE inventory
-                SET is_assigned = 0, trade_id = NULL, criteria_id = NULL, criteria_snapshot = NULL, updated_at = CURRENT_TIMESTAMP
-                WHERE serial = ?
-            """, (serial,))
+            for batch in _batched(serials):
+                placeholders = ','.join('?' * len(batch))
+                cursor.execute(f"""
+                    UPDATE inventory
+                    SET is_assigned = 0, trade_id = NULL, criteria_id = NULL, criteria_snapshot = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE serial IN ({placeholders})
+                """, batch)
+                unassigned_count += cursor.rowcount
 
-            if cursor.rowcount > 0:
-                unassigned_count += 1
-
-        conn.commit()
-        conn.close()
+            conn.commit()
 
         # Restore criteria quantities after unassigning
         if restore_criteria and criteria_to_restore:
-            for criteria_id, info in criteria_to_restore.items():
-                restore_criteria_on_unassign(
-                    criteria_id,
-                    info['count'],
-                    username or 'system',
-                    info['snapshot']
-                )
+            restore_criteria_on_unassign_bulk(
+                [(criteria_id, info['count'], info['snapshot'])
+                 for criteria_id, info in criteria_to_restore.items()],
+                username or 'system'
+            )
 
         return True, f"Successfully unassigned {unassigned_count} item(s)", unassigned_count
     except Exception as e:
         return False, str(e), 0
 
 
-def get_inventory_by_trade(trade_id):
-    """Get all inventory items assigned to a specific trade"""
-    try:
-        conn = get_inventory_db_connection()
+def _build_inventory_dicts(rows):
+    """
+    Convert inventory tuples to the item dicts used by the trade views.
+
+    Rows must carry the columns id, market, registry, product, project_id,
+    project_type, protocol, project_name, vintage, serial, is_custody,
+    is_assigned, trade_id in that order.
+    """
+    return [{
+        '_row_index': r[0],
+        'Market': r[1] or '',
+        'Registry': r[2] or '',
+        'Product': r[3] or '',
+        'ProjectID': r[4] or '',
+        'ProjectType': r[5] or '',
+        'Protocol': r[6] or '',
+        'ProjectName': r[7] or '',
+        'Vintage': r[8] or '',
+        'Serial': r[9] or '',
+        'IsCustody': r[10] or '',
+        'IsAssigned': 'True' if r[11] else 'False',
+        'TradeID': r[12] or ''
+    } for r in rows]
+
+
+def iter_inventory_by_trade(trade_id, chunk_size=500):
+    """
+    Yield the inventory items assigned to a trade, reading chunk_size rows at a time.
+
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    with inventory_db_connection() as conn:
+        conn.row_factory = None  # plain tuples for _build_inventory_dicts
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, market, registry, product, project_id, project_type,
@@ -1607,70 +2127,50 @@ def get_inventory_by_trade(trade_id):
             WHERE trade_id = ?
             ORDER BY id
         """, (trade_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from _build_inventory_dicts(rows)
 
-        items = []
-        for row in rows:
-            item_data = {
-                '_row_index': row['id'],
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'Serial': row['serial'] or '',
-                'IsCustody': row['is_custody'] or '',
-                'IsAssigned': 'True' if row['is_assigned'] else 'False',
-                'TradeID': row['trade_id'] or ''
-            }
-            items.append(item_data)
 
-        return items
+def get_inventory_by_trade(trade_id):
+    """Get all inventory items assigned to a specific trade"""
+    try:
+        return list(iter_inventory_by_trade(trade_id))
     except Exception as e:
         print(f"Error getting inventory by trade: {e}")
         return []
 
 
-def get_unassigned_inventory():
-    """Get all unassigned inventory items"""
-    try:
-        conn = get_inventory_db_connection()
+def iter_unassigned_inventory(chunk_size=500):
+    """
+    Yield all unassigned inventory items, reading chunk_size rows at a time.
+
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    with inventory_db_connection() as conn:
+        conn.row_factory = None  # plain tuples for _build_inventory_dicts
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, market, registry, product, project_id, project_type,
                    protocol, project_name, vintage, serial, is_custody,
-                   is_assigned, trade_id
+                   0, NULL
             FROM inventory
             WHERE is_assigned = 0 OR is_assigned IS NULL
             ORDER BY id
         """)
-        rows = cursor.fetchall()
-        conn.close()
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from _build_inventory_dicts(rows)
 
-        items = []
-        for row in rows:
-            item_data = {
-                '_row_index': row['id'],
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'Serial': row['serial'] or '',
-                'IsCustody': row['is_custody'] or '',
-                'IsAssigned': 'False',
-                'TradeID': ''
-            }
-            items.append(item_data)
 
-        return items
+def get_unassigned_inventory():
+    """Get all unassigned inventory items"""
+    try:
+        return list(iter_unassigned_inventory())
     except Exception as e:
         print(f"Error getting unassigned inventory: {e}")
         return []
@@ -1689,27 +2189,19 @@ def create_serials_for_trade(serials, trade_id, inventory_data, warranty_data):
     Returns:
         (success, message, created_count)
     """
+    serials = list(serials)
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        created_count = 0
-        skipped_serials = []
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        for serial in serials:
-            # Check if serial already exists
-            cursor.execute("SELECT id FROM inventory WHERE serial = ?", (serial,))
-            if cursor.fetchone():
-                skipped_serials.append(serial)
-                continue
+            # Take the write lock up front so no other writer can insert rows between
+            # reading MAX(id) and the inserts below
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM inventory").fetchone()[0]
 
-            # Insert new inventory item
-            cursor.execute("""
-                INSERT INTO inventory (market, registry, product, project_id, project_type,
-                                     protocol, project_name, vintage, serial, is_custody,
-                                     is_assigned, trade_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-            """, (
+            # Insert new inventory items; serials that already exist (or repeat
+            # earlier in the list) are ignored by the UNIQUE constraint on serial
+            inventory_values = (
                 inventory_data.get('market', ''),
                 inventory_data.get('registry', ''),
                 inventory_data.get('product', ''),
@@ -1717,33 +2209,39 @@ def create_serials_for_trade(serials, trade_id, inventory_data, warranty_data):
                 inventory_data.get('project_type', ''),
                 inventory_data.get('protocol', ''),
                 inventory_data.get('project_name', ''),
-                inventory_data.get('vintage', ''),
-                serial,
-                inventory_data.get('is_custody', 'Yes'),
-                trade_id
-            ))
-
-            # Create warranty record with BUY info
-            cursor.execute("""
-                INSERT OR REPLACE INTO warranties (
-                    serial, buy_tradeid, buy_client, buy_start, buy_end
-                )
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                serial,
-                trade_id,
-                warranty_data.get('buy_client', ''),
-                warranty_data.get('buy_start', ''),
-                warranty_data.get('buy_end', '')
-            ))
+                inventory_data.get('vintage', '')
+            )
+            is_custody = inventory_data.get('is_custody', 'Yes')
+            cursor.executemany("""
+                INSERT OR IGNORE INTO inventory (market, registry, product, project_id, project_type,
+                                               protocol, project_name, vintage, serial, is_custody,
+                                               is_assigned, trade_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+            """, [inventory_values + (serial, is_custody, trade_id) for serial in serials])
+            created_count = max(cursor.rowcount, 0)
+            skipped_count = len(serials) - created_count
 
-            created_count += 1
+            # Create warranty records with BUY info for the rows just inserted
+            if created_count:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO warranties (
+                        serial, buy_tradeid, buy_client, buy_start, buy_end
+                    )
+                    SELECT serial, ?, ?, ?, ?
+                    FROM inventory
+                    WHERE id > ?
+                """, (
+                    trade_id,
+                    warranty_data.get('buy_client', ''),
+                    warranty_data.get('buy_start', ''),
+                    warranty_data.get('buy_end', ''),
+                    last_id
+                ))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
-        if skipped_serials:
-            return True, f"Created {created_count} serial(s). Skipped {len(skipped_serials)} existing serial(s)", created_count
+        if skipped_count:
+            return True, f"Created {created_count} serial(s). Skipped {skipped_count} existing serial(s)", created_count
         return True, f"Successfully created {created_count} serial(s)", created_count
     except Exception as e:
         return False, str(e), 0
@@ -1753,33 +2251,46 @@ def create_serials_for_trade(serials, trade_id, inventory_data, warranty_data):
 def get_all_role_permissions():
     """Get all role permissions"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT role, allowed_pages FROM role_permissions ORDER BY role")
-        rows = cursor.fetchall()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT role, allowed_pages FROM role_permissions ORDER BY role")
+            rows = cursor.fetchall()
 
         result = {}
         for row in rows:
-            result[row['role']] = json.loads(row['allowed_pages'])
+            result[row['role']] = _json_loads(row['allowed_pages'])
         return result
     except Exception as e:
         print(f"Error getting role permissions: {e}")
         return {}
 
 
-def get_role_permissions(role):
-    """Get permissions for a specific role"""
-    try:
-        conn = get_db_connection()
+# role -> (time.monotonic() when read, allowed pages). check_page_access runs
+# on every protected request; entries expire after _ROLE_PERMISSIONS_TTL
+# seconds so changes made by other processes are picked up.
+_role_permissions_cache = {}
+_ROLE_PERMISSIONS_TTL = 60.0
+
+def _cached_role_pages(role):
+    """Return the cached allowed-pages list for role (shared; do not mutate)"""
+    cached = _role_permissions_cache.get(role)
+    if cached is not None and time.monotonic() - cached[0] < _ROLE_PERMISSIONS_TTL:
+        return cached[1]
+
+    with db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT allowed_pages FROM role_permissions WHERE role = ?", (role,))
         row = cursor.fetchone()
-        conn.close()
 
-        if row:
-            return json.loads(row['allowed_pages'])
-        return []
+    pages = _json_loads(row['allowed_pages']) if row else []
+    _role_permissions_cache[role] = (time.monotonic(), pages)
+    return pages
+
+
+def get_role_permissions(role):
+    """Get permissions for a specific role"""
+    try:
+        return list(_cached_role_pages(role))
     except Exception as e:
         print(f"Error getting role permissions: {e}")
         return []
@@ -1788,15 +2299,15 @@ def get_role_permissions(role):
 def update_role_permissions(role, allowed_pages):
     """Update permissions for a role"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """INSERT OR REPLACE INTO role_permissions (role, allowed_pages, updated_at)
-               VALUES (?, ?, CURRENT_TIMESTAMP)""",
-            (role, json.dumps(allowed_pages))
-        )
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT OR REPLACE INTO role_permissions (role, allowed_pages, updated_at)
+                   VALUES (?, ?, CURRENT_TIMESTAMP)""",
+                (role, _json_dumps(allowed_pages))
+            )
+            conn.commit()
+        _role_permissions_cache.pop(role, None)
         return True, "Permissions updated successfully"
     except Exception as e:
         return False, str(e)
@@ -1805,18 +2316,15 @@ def update_role_permissions(role, allowed_pages):
 def check_page_access(username, page):
     """Check if a user has access to a specific page"""
     try:
-        user = get_user_by_username(username)
-        if not user:
+        role = get_user_role(username)
+        if not role:
             return False
 
-        role = user['role']
-
         # Admin always has access to everything
         if role == 'admin':
             return True
 
-        allowed_pages = get_role_permissions(role)
-        return page in allowed_pages
+        return page in _cached_role_pages(role)
     except Exception as e:
         print(f"Error checking page access: {e}")
         return False
@@ -1846,10 +2354,19 @@ def get_available_roles():
 # SYSTEM SETTINGS FUNCTIONS
 # =============================================================================
 
+# key -> (time.monotonic() when read, value or None if unset). Lets hot paths
+# such as log_activity check a setting without a query; entries expire after
+# _SETTINGS_TTL seconds so changes made by other processes are picked up.
+_settings_cache = {}
+_SETTINGS_TTL = 5.0
+
 def get_system_setting(key, default=None):
     """
     Get a system setting value by key.
 
+    Values are cached in-process for a few seconds; set_system_setting
+    updates the cache immediately.
+
     Args:
         key: The setting key to retrieve
         default: Default value if key not found
@@ -1857,13 +2374,19 @@ def get_system_setting(key, default=None):
     Returns:
         The setting value or default
     """
+    cached = _settings_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < _SETTINGS_TTL:
+        value = cached[1]
+        return value if value is not None else default
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM system_settings WHERE key = ?", (key,))
-        row = cursor.fetchone()
-        conn.close()
-        return row['value'] if row else default
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM system_settings WHERE key = ?", (key,))
+            row = cursor.fetchone()
+        value = row['value'] if row else None
+        _settings_cache[key] = (time.monotonic(), value)
+        return value if value is not None else default
     except Exception:
         return default
 
@@ -1881,18 +2404,19 @@ def set_system_setting(key, value, username=None):
         (success, message)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO system_settings (key, value, updated_at, updated_by)
-            VALUES (?, ?, CURRENT_TIMESTAMP, ?)
-            ON CONFLICT(key) DO UPDATE SET
-                value = excluded.value,
-                updated_at = CURRENT_TIMESTAMP,
-                updated_by = excluded.updated_by
-        """, (key, value, username))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO system_settings (key, value, updated_at, updated_by)
+                VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = CURRENT_TIMESTAMP,
+                    updated_by = excluded.updated_by
+            """, (key, value, username))
+            conn.commit()
+        # Write through so the change applies immediately in this process
+        _settings_cache[key] = (time.monotonic(), str(value))
         return True, "Setting updated"
     except Exception as e:
         return False, str(e)
@@ -1940,11 +2464,144 @@ def set_backup_tracking_enabled(enabled, username=None):
 # ACTIVITY LOGGING FUNCTIONS
 # =============================================================================
 
+# Column order used when building activity log dicts from plain tuples
+ACTIVITY_LOG_COLUMNS = (
+    'id', 'username', 'action_type', 'target_type', 'target_id', 'serial', 'details',
+    'before_data', 'after_data', 'is_reverted', 'reverted_by', 'reverted_at', 'created_at'
+)
+
+# Fixed statements for every filter combination, so the prepared statements
+# are reused from the connection's statement cache. Absent filters bind NULL.
+_ACTIVITY_LOGS_SELECT = """
+    SELECT id, username, action_type, target_type, target_id, serial, details,
+           before_data, after_data, is_reverted, reverted_by, reverted_at, created_at
+    FROM activity_logs
+    WHERE (:username IS NULL OR username = :username)
+      AND (:action_type IS NULL OR action_type = :action_type)
+      AND (:target_type IS NULL OR target_type = :target_type)
+      AND (:date_from IS NULL OR date(created_at) >= date(:date_from))
+      AND (:date_to IS NULL OR date(created_at) <= date(:date_to))
+      AND (:serial IS NULL OR serial LIKE :serial)
+      AND (:is_reverted IS NULL OR is_reverted = :is_reverted)
+"""
+ACTIVITY_LOGS_QUERY = _ACTIVITY_LOGS_SELECT + """
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit OFFSET :offset
+"""
+# Keyset page: logs after the (created_at, id) cursor. The plain range on
+# created_at lets SQLite seek into idx_activity_logs_created.
+ACTIVITY_LOGS_AFTER_QUERY = _ACTIVITY_LOGS_SELECT + """
+      AND created_at <= :cursor_created_at
+      AND (created_at < :cursor_created_at OR id < :cursor_id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit
+"""
+ACTIVITY_LOG_BY_ID_QUERY = """
+    SELECT id, username, action_type, target_type, target_id, serial, details,
+           before_data, after_data, is_reverted, reverted_by, reverted_at, created_at
+    FROM activity_logs
+    WHERE id = ?
+"""
+
+_LOG_INSERT = """
+    INSERT INTO activity_logs
+    (username, action_type, target_type, target_id, serial, details, before_data, after_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Every this many logged activities the users database WAL is checkpointed and
+# truncated, so a busy log table doesn't leave a large -wal file behind
+_LOG_CHECKPOINT_INTERVAL = 1000
+_log_writes_since_checkpoint = 0
+_log_checkpoint_lock = threading.Lock()
+
+# Activities are normally written by a background thread in batches of up to
+# _LOG_BATCH_SIZE, collected for at most _LOG_FLUSH_INTERVAL seconds
+_LOG_BATCH_SIZE = 100
+_LOG_FLUSH_INTERVAL = 0.05
+_log_queue = queue.Queue()
+_log_worker_thread = None
+_log_worker_lock = threading.Lock()
+
+
+def _log_payload(data):
+    """Serialize before/after data for storage; JSON passed in as text is stored as-is"""
+    if not data:
+        return None
+    if isinstance(data, str):
+        return data
+    if isinstance(data, bytes):
+        return data.decode()
+    return _json_dumps(data)
+
+
+def _checkpoint_log_wal(conn, written):
+    """Record written log rows and checkpoint the WAL once the interval is reached"""
+    global _log_writes_since_checkpoint
+    with _log_checkpoint_lock:
+        _log_writes_since_checkpoint += written
+        due = _log_writes_since_checkpoint >= _LOG_CHECKPOINT_INTERVAL
+        if due:
+            _log_writes_since_checkpoint = 0
+    if due:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _write_log_batch(batch):
+    """Insert a batch of queued log rows in one transaction"""
+    try:
+        with db_connection() as conn:
+            conn.executemany(_LOG_INSERT, batch)
+            conn.commit()
+            _checkpoint_log_wal(conn, len(batch))
+    except Exception as e:
+        print(f"Error writing {len(batch)} activity log(s): {e}")
+
+
+def _log_worker():
+    """Drain the log queue forever, writing rows in batches"""
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+        while len(batch) < _LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_log_batch(batch)
+        for _ in batch:
+            _log_queue.task_done()
+
+
+def _start_log_worker():
+    """Start the background log writer on first use"""
+    global _log_worker_thread
+    with _log_worker_lock:
+        if _log_worker_thread is None:
+            _log_worker_thread = threading.Thread(
+                target=_log_worker, name='activity-log-writer', daemon=True)
+            _log_worker_thread.start()
+            atexit.register(flush_activity_logs)
+
+
+def flush_activity_logs():
+    """Block until every queued activity log has been written"""
+    if _log_worker_thread is not None:
+        _log_queue.join()
+
+
 def log_activity(username, action_type, target_type, target_id=None, serial=None,
-                 details=None, before_data=None, after_data=None):
+                 details=None, before_data=None, after_data=None, wait=False):
     """
     Log an activity to the activity_logs table.
 
+    The row is queued and written shortly afterwards by a background thread,
+    so the caller does not wait on the database. Pass wait=True to write it
+    immediately and get its log_id back.
+
     Args:
         username: The user performing the action
         action_type: Type of action (add, update, delete, import, restore, login, etc.)
@@ -1952,137 +2609,128 @@ def log_activity(username, action_type, target_type, target_id=None, serial=None
         target_id: ID of the target record (optional)
         serial: Serial number if applicable (optional)
         details: Human-readable description of the action
-        before_data: JSON string of data before the change (optional)
-        after_data: JSON string of data after the change (optional)
+        before_data: Data before the change, or its JSON string (optional)
+        after_data: Data after the change, or its JSON string (optional)
+        wait: Write synchronously and return the new log_id (optional)
 
     Returns:
-        (success, log_id or error_message)
+        (success, log_id or error_message); log_id is None unless wait=True
     """
     # Check if logging is enabled (paused)
     if not is_logging_enabled():
         return True, None  # Silently skip logging when paused
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO activity_logs
-            (username, action_type, target_type, target_id, serial, details, before_data, after_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        params = (
             username,
             action_type,
             target_type,
             target_id,
             serial,
             details,
-            json.dumps(before_data) if before_data else None,
-            json.dumps(after_data) if after_data else None
-        ))
+            _log_payload(before_data),
+            _log_payload(after_data)
+        )
 
-        conn.commit()
-        log_id = cursor.lastrowid
-        conn.close()
+        if not wait:
+            _start_log_worker()
+            _log_queue.put(params)
+            return True, None
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            if _HAS_RETURNING:
+                cursor.execute(_LOG_INSERT + "RETURNING id", params)
+                log_id = cursor.fetchone()[0]
+            else:
+                cursor.execute(_LOG_INSERT, params)
+                log_id = cursor.lastrowid
+
+            conn.commit()
+            _checkpoint_log_wal(conn, 1)
 
         return True, log_id
     except Exception as e:
         return False, str(e)
 
 
-def get_activity_logs(filters=None, limit=500, offset=0):
+def get_activity_logs(filters=None, limit=500, offset=0, cursor_created_at=None, cursor_id=None):
     """
     Get activity logs with optional filtering.
 
+    Pages can be fetched by offset or, preferably, by keyset: pass the
+    created_at and id of the last log already shown as cursor_created_at and
+    cursor_id to get the logs that follow it. Keyset pages are an index seek
+    no matter how deep they are, while offsets scan and discard the skipped
+    rows.
+
     Args:
         filters: Dict with optional keys: username, action_type, target_type,
                  date_from, date_to, serial, is_reverted
         limit: Maximum number of records to return
-        offset: Number of records to skip
+        offset: Number of records to skip (ignored when a keyset cursor is given,
+                so the two paging modes are never combined)
+        cursor_created_at: created_at of the last log of the previous page
+        cursor_id: id of the last log of the previous page
 
     Returns:
-        List of activity log records
+        List of activity log records. before_data/after_data are returned as
+        the stored JSON strings; the list view does not render them, and
+        get_activity_log_by_id() returns them parsed.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM activity_logs WHERE 1=1"
-        params = []
-
-        if filters:
-            if filters.get('username'):
-                query += " AND username = ?"
-                params.append(filters['username'])
-            if filters.get('action_type'):
-                query += " AND action_type = ?"
-                params.append(filters['action_type'])
-            if filters.get('target_type'):
-                query += " AND target_type = ?"
-                params.append(filters['target_type'])
-            if filters.get('date_from'):
-                query += " AND date(created_at) >= date(?)"
-                params.append(filters['date_from'])
-            if filters.get('date_to'):
-                query += " AND date(created_at) <= date(?)"
-                params.append(filters['date_to'])
-            if filters.get('serial'):
-                query += " AND serial LIKE ?"
-                params.append(f"%{filters['serial']}%")
-            if filters.get('is_reverted') is not None:
-                query += " AND is_reverted = ?"
-                params.append(1 if filters['is_reverted'] else 0)
-
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-
-        cursor.execute(query, params)
-        logs = cursor.fetchall()
-        conn.close()
-
-        result = []
-        for log in logs:
-            log_dict = dict(log)
-            # Parse JSON fields
-            if log_dict.get('before_data'):
-                try:
-                    log_dict['before_data'] = json.loads(log_dict['before_data'])
-                except:
-                    pass
-            if log_dict.get('after_data'):
-                try:
-                    log_dict['after_data'] = json.loads(log_dict['after_data'])
-                except:
-                    pass
-            result.append(log_dict)
+        with db_connection() as conn:
+            conn.row_factory = None  # plain tuples, zipped with ACTIVITY_LOG_COLUMNS below
+            cursor = conn.cursor()
+
+            filters = filters or {}
+            is_reverted = filters.get('is_reverted')
+            use_cursor = cursor_created_at is not None and cursor_id is not None
+            cursor.execute(ACTIVITY_LOGS_AFTER_QUERY if use_cursor else ACTIVITY_LOGS_QUERY, {
+                'username': filters.get('username') or None,
+                'action_type': filters.get('action_type') or None,
+                'target_type': filters.get('target_type') or None,
+                'date_from': filters.get('date_from') or None,
+                'date_to': filters.get('date_to') or None,
+                'serial': f"%{filters['serial']}%" if filters.get('serial') else None,
+                'is_reverted': None if is_reverted is None else (1 if is_reverted else 0),
+                'cursor_created_at': cursor_created_at,
+                'cursor_id': cursor_id,
+                'limit': limit,
+                'offset': offset
+            })
+            logs = cursor.fetchall()
 
-        return result
+        return [dict(zip(ACTIVITY_LOG_COLUMNS, log)) for log in logs]
     except Exception as e:
         print(f"Error getting activity logs: {e}")
         return []
 
 
+def _parse_log_json(text):
+    """Decode a stored before/after payload, leaving empty or invalid values as they are"""
+    if not text:
+        return text
+    try:
+        return _json_loads(text)
+    except ValueError:
+        return text
+
+
 def get_activity_log_by_id(log_id):
     """Get a specific activity log by ID"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM activity_logs WHERE id = ?", (log_id,))
-        log = cursor.fetchone()
-        conn.close()
+        with db_connection() as conn:
+            conn.row_factory = None  # plain tuple, zipped with ACTIVITY_LOG_COLUMNS below
+            cursor = conn.cursor()
+            cursor.execute(ACTIVITY_LOG_BY_ID_QUERY, (log_id,))
+            log = cursor.fetchone()
 
         if log:
-            log_dict = dict(log)
-            if log_dict.get('before_data'):
-                try:
-                    log_dict['before_data'] = json.loads(log_dict['before_data'])
-                except:
-                    pass
-            if log_dict.get('after_data'):
-                try:
-                    log_dict['after_data'] = json.loads(log_dict['after_data'])
-                except:
-                    pass
+            log_dict = dict(zip(ACTIVITY_LOG_COLUMNS, log))
+            log_dict['before_data'] = _parse_log_json(log_dict['before_data'])
+            log_dict['after_data'] = _parse_log_json(log_dict['after_data'])
             return log_dict
         return None
     except Exception as e:
@@ -2093,20 +2741,28 @@ def get_activity_log_by_id(log_id):
 def mark_activity_reverted(log_id, reverted_by):
     """Mark an activity log as reverted"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            UPDATE activity_logs
-            SET is_reverted = 1, reverted_by = ?, reverted_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (reverted_by, log_id))
+            if _HAS_RETURNING:
+                cursor.execute("""
+                    UPDATE activity_logs
+                    SET is_reverted = 1, reverted_by = ?, reverted_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    RETURNING id
+                """, (reverted_by, log_id))
+                affected = cursor.fetchone() is not None
+            else:
+                cursor.execute("""
+                    UPDATE activity_logs
+                    SET is_reverted = 1, reverted_by = ?, reverted_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (reverted_by, log_id))
+                affected = cursor.rowcount > 0
 
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+            conn.commit()
 
-        return affected > 0
+        return affected
     except Exception as e:
         print(f"Error marking activity as reverted: {e}")
         return False
@@ -2115,73 +2771,58 @@ def mark_activity_reverted(log_id, reverted_by):
 def clear_activity_reverted(log_id):
     """Clear the reverted status of an activity log (for redo)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            UPDATE activity_logs
-            SET is_reverted = 0, reverted_by = NULL, reverted_at = NULL
-            WHERE id = ?
-        """, (log_id,))
-
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
-
-        return affected > 0
-    except Exception as e:
-        print(f"Error clearing activity reverted status: {e}")
-        return False
-
-
-def get_activity_log_stats():
-    """Get statistics about activity logs"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get counts by action type
-        cursor.execute("""
-            SELECT action_type, COUNT(*) as count
-            FROM activity_logs
-            GROUP BY action_type
-        """)
-        action_counts = {row['action_type']: row['count'] for row in cursor.fetchall()}
+            cursor.execute("""
+                UPDATE activity_logs
+                SET is_reverted = 0, reverted_by = NULL, reverted_at = NULL
+                WHERE id = ?
+            """, (log_id,))
 
-        # Get counts by target type
-        cursor.execute("""
-            SELECT target_type, COUNT(*) as count
-            FROM activity_logs
-            GROUP BY target_type
-        """)
-        target_counts = {row['target_type']: row['count'] for row in cursor.fetchall()}
+            conn.commit()
+            affected = cursor.rowcount
 
-        # Get counts by user
-        cursor.execute("""
-            SELECT username, COUNT(*) as count
-            FROM activity_logs
-            GROUP BY username
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-        user_counts = {row['username']: row['count'] for row in cursor.fetchall()}
+        return affected > 0
+    except Exception as e:
+        print(f"Error clearing activity reverted status: {e}")
+        return False
 
-        # Get total count
-        cursor.execute("SELECT COUNT(*) as total FROM activity_logs")
-        total = cursor.fetchone()['total']
 
-        # Get reverted count
-        cursor.execute("SELECT COUNT(*) as reverted FROM activity_logs WHERE is_reverted = 1")
-        reverted = cursor.fetchone()['reverted']
+def get_activity_log_stats():
+    """Get statistics about activity logs"""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        conn.close()
+            # One grouped scan; every statistic is summed from these groups.
+            # Grouping on the plain columns lets idx_activity_logs_stats cover it.
+            cursor.execute("""
+                SELECT action_type, target_type, username, is_reverted = 1, COUNT(*)
+                FROM activity_logs
+                GROUP BY action_type, target_type, username, is_reverted
+            """)
+            groups = cursor.fetchall()
+
+        action_counts = Counter()
+        target_counts = Counter()
+        user_counts = Counter()
+        total = 0
+        reverted = 0
+        for action_type, target_type, username, is_reverted, count in groups:
+            action_counts[action_type] += count
+            target_counts[target_type] += count
+            user_counts[username] += count
+            total += count
+            if is_reverted:
+                reverted += count
 
         return {
             'total': total,
             'reverted': reverted,
-            'by_action': action_counts,
-            'by_target': target_counts,
-            'by_user': user_counts
+            'by_action': dict(action_counts),
+            'by_target': dict(target_counts),
+            'by_user': dict(user_counts.most_common(10))
         }
     except Exception as e:
         print(f"Error getting activity stats: {e}")
@@ -2191,24 +2832,24 @@ def get_activity_log_stats():
 def get_distinct_log_values():
     """Get distinct values for filter dropdowns"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT DISTINCT username FROM activity_logs ORDER BY username")
-        usernames = [row['username'] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT DISTINCT action_type FROM activity_logs ORDER BY action_type")
-        action_types = [row['action_type'] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT DISTINCT target_type FROM activity_logs ORDER BY target_type")
-        target_types = [row['target_type'] for row in cursor.fetchall()]
-
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            # One scan; the number of distinct combinations is small
+            cursor.execute("SELECT DISTINCT username, action_type, target_type FROM activity_logs")
+            combinations = cursor.fetchall()
+
+        usernames = set()
+        action_types = set()
+        target_types = set()
+        for username, action_type, target_type in combinations:
+            usernames.add(username)
+            action_types.add(action_type)
+            target_types.add(target_type)
 
         return {
-            'usernames': usernames,
-            'action_types': action_types,
-            'target_types': target_types
+            'usernames': sorted(usernames),
+            'action_types': sorted(action_types),
+            'target_types': sorted(target_types)
         }
     except Exception as e:
         print(f"Error getting distinct log values: {e}")
@@ -2219,6 +2860,109 @@ def get_distinct_log_values():
 # INVENTORY RESERVATION FUNCTIONS (for Sell Generic)
 # =============================================================================
 
+# Fixed statements shared by the reservation functions
+_RESERVE_ITEM_SQL = """
+    UPDATE inventory SET
+        is_reserved = 1,
+        reserved_for_trade_id = ?
+    WHERE serial = ?
+"""
+_RECORD_RESERVATION_SQL = """
+    INSERT INTO inventory_reservations
+    (trade_id, criteria_id, serial, reserved_by, status)
+    VALUES (?, ?, ?, ?, 'active')
+"""
+_RELEASE_ITEM_SQL = """
+    UPDATE inventory SET
+        is_reserved = 0,
+        reserved_for_trade_id = NULL
+    WHERE serial = ? AND is_reserved = 1
+"""
+_CLOSE_RESERVATION_SQL = """
+    UPDATE inventory_reservations SET
+        status = 'released',
+        released_at = CURRENT_TIMESTAMP,
+        released_by = ?
+    WHERE serial = ? AND status = 'active'
+"""
+_DELIVER_ITEM_SQL = """
+    UPDATE inventory SET
+        is_assigned = 1,
+        trade_id = ?,
+        is_reserved = 0,
+        reserved_for_trade_id = NULL
+    WHERE serial = ?
+"""
+_DELIVER_RESERVATION_SQL = """
+    UPDATE inventory_reservations SET
+        status = 'delivered',
+        released_at = CURRENT_TIMESTAMP,
+        released_by = ?
+    WHERE serial = ? AND status = 'active'
+"""
+
+
+# Optional filters of get_inventory_by_criteria, in the order they appear in the SQL
+_CRITERIA_FILTERS = (
+    ('market', "market = ?"),
+    ('registry', "registry = ?"),
+    ('product', "product = ?"),
+    ('project_type', "project_type = ?"),
+    ('protocol', "protocol = ?"),
+    ('project_id', "project_id = ?"),
+    ('vintage_from', "vintage >= ?"),
+    ('vintage_to', "vintage <= ?"),
+)
+
+# Same payload as _inv_row_to_item, assembled by SQLite as one JSON text per row
+# so Python only runs a single C-level parse instead of fifteen column reads
+_INV_ITEM_JSON_SELECT = """
+        SELECT json_object(
+            '_row_index', id,
+            'Market', COALESCE(market, ''),
+            'Registry', COALESCE(registry, ''),
+            'Product', COALESCE(product, ''),
+            'ProjectID', COALESCE(project_id, ''),
+            'ProjectType', COALESCE(project_type, ''),
+            'Protocol', COALESCE(protocol, ''),
+            'ProjectName', COALESCE(project_name, ''),
+            'Vintage', COALESCE(vintage, ''),
+            'Serial', COALESCE(serial, ''),
+            'IsCustody', COALESCE(is_custody, ''),
+            'IsAssigned', CASE WHEN is_assigned THEN 'True' ELSE 'False' END,
+            'TradeID', COALESCE(trade_id, ''),
+            'IsReserved', CASE WHEN is_reserved THEN 'True' ELSE 'False' END,
+            'ReservedForTradeID', COALESCE(reserved_for_trade_id, '')
+        )
+"""
+
+@lru_cache(maxsize=None)
+def _inventory_criteria_query(shape, exclude_reserved, exclude_assigned):
+    """
+    Build (once per filter combination) the SQL for get_inventory_by_criteria.
+
+    shape holds one flag per _CRITERIA_FILTERS entry saying whether that filter
+    is present; there are at most 2**8 * 4 distinct queries.
+    """
+    query = _INV_ITEM_JSON_SELECT + """
+        FROM inventory
+        WHERE 1=1
+    """
+    for (_, clause), present in zip(_CRITERIA_FILTERS, shape):
+        if present:
+            query += " AND " + clause
+
+    # state: 0 = free, 1 = reserved, 2 = assigned, 3 = both
+    if exclude_reserved and exclude_assigned:
+        query += " AND state = 0"
+    elif exclude_reserved:
+        query += " AND state IN (0, 2)"
+    elif exclude_assigned:
+        query += " AND state IN (0, 1)"
+
+    return query + " ORDER BY vintage, serial"
+
+
 def get_inventory_by_criteria(criteria, exclude_reserved=True, exclude_assigned=False):
     """
     Query inventory items matching the given criteria.
@@ -2233,73 +2977,16 @@ def get_inventory_by_criteria(criteria, exclude_reserved=True, exclude_assigned=
         List of matching inventory items
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-            SELECT id, market, registry, product, project_id, project_type,
-                   protocol, project_name, vintage, serial, is_custody,
-                   is_assigned, trade_id, is_reserved, reserved_for_trade_id
-            FROM inventory
-            WHERE 1=1
-        """
-        params = []
+        with inventory_read_connection() as conn:
+            conn.row_factory = None  # one JSON text column per row
+            cursor = conn.cursor()
 
-        if criteria.get('market'):
-            query += " AND market = ?"
-            params.append(criteria['market'])
-        if criteria.get('registry'):
-            query += " AND registry = ?"
-            params.append(criteria['registry'])
-        if criteria.get('product'):
-            query += " AND product = ?"
-            params.append(criteria['product'])
-        if criteria.get('project_type'):
-            query += " AND project_type = ?"
-            params.append(criteria['project_type'])
-        if criteria.get('protocol'):
-            query += " AND protocol = ?"
-            params.append(criteria['protocol'])
-        if criteria.get('project_id'):
-            query += " AND project_id = ?"
-            params.append(criteria['project_id'])
-        if criteria.get('vintage_from'):
-            query += " AND vintage >= ?"
-            params.append(criteria['vintage_from'])
-        if criteria.get('vintage_to'):
-            query += " AND vintage <= ?"
-            params.append(criteria['vintage_to'])
-
-        if exclude_reserved:
-            query += " AND (is_reserved = 0 OR is_reserved IS NULL)"
-        if exclude_assigned:
-            query += " AND (is_assigned = 0 OR is_assigned IS NULL)"
-
-        query += " ORDER BY vintage, serial"
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+            shape = tuple(bool(criteria.get(key)) for key, _ in _CRITERIA_FILTERS)
+            query = _inventory_criteria_query(shape, bool(exclude_reserved), bool(exclude_assigned))
+            params = [criteria[key] for (key, _), present in zip(_CRITERIA_FILTERS, shape) if present]
 
-        items = []
-        for row in rows:
-            items.append({
-                '_row_index': row['id'],
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'Serial': row['serial'] or '',
-                'IsCustody': row['is_custody'] or '',
-                'IsAssigned': 'True' if row['is_assigned'] else 'False',
-                'TradeID': row['trade_id'] or '',
-                'IsReserved': 'True' if row['is_reserved'] else 'False',
-                'ReservedForTradeID': row['reserved_for_trade_id'] or ''
-            })
+            cursor.execute(query, params)
+            items = [_json_loads(r[0]) for r in cursor]
 
         return items
     except Exception as e:
@@ -2321,48 +3008,71 @@ def reserve_inventory(serials, trade_id, username, criteria_id=None):
         (success, message, count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        reserved_count = 0
-        already_reserved = []
-        not_found = []
-
-        for serial in serials:
-            # Check if item exists and is not already reserved
-            cursor.execute("""
-                SELECT id, is_reserved, reserved_for_trade_id
-                FROM inventory WHERE serial = ?
-            """, (serial,))
-            row = cursor.fetchone()
-
-            if not row:
-                not_found.append(serial)
-                continue
-
-            if row['is_reserved']:
-                already_reserved.append(serial)
-                continue
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            unique_serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+
+            if _HAS_RETURNING:
+                # Reserve whatever is free straight away; only serials that could not
+                # be reserved need a second look to tell missing from already reserved
+                newly_reserved = set()
+                for batch in _batched(unique_serials):
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(f"""
+                        UPDATE inventory SET
+                            is_reserved = 1,
+                            reserved_for_trade_id = ?
+                        WHERE serial IN ({placeholders}) AND (is_reserved = 0 OR is_reserved IS NULL)
+                        RETURNING serial
+                    """, [trade_id] + batch)
+                    newly_reserved.update(row[0] for row in cursor.fetchall())
+
+                existing = set(newly_reserved)
+                for batch in _batched([serial for serial in unique_serials if serial not in newly_reserved]):
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(f"SELECT serial FROM inventory WHERE serial IN ({placeholders})", batch)
+                    existing.update(row[0] for row in cursor.fetchall())
+            else:
+                # Look up every serial at once instead of one SELECT per serial
+                existing = set()
+                newly_reserved = set()
+                for batch in _batched(unique_serials):
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(f"""
+                        SELECT serial, is_reserved
+                        FROM inventory WHERE serial IN ({placeholders})
+                    """, batch)
+                    for serial, is_reserved in cursor.fetchall():
+                        existing.add(serial)
+                        if not is_reserved:
+                            newly_reserved.add(serial)
+
+                # Reserve the items
+                cursor.executemany(_RESERVE_ITEM_SQL, [(trade_id, serial) for serial in unique_serials
+                                                       if serial in newly_reserved])
+
+            to_reserve = []
+            already_reserved = []
+            not_found = []
 
-            # Reserve the item
-            cursor.execute("""
-                UPDATE inventory SET
-                    is_reserved = 1,
-                    reserved_for_trade_id = ?
-                WHERE serial = ?
-            """, (trade_id, serial))
+            for serial in serials:
+                if serial not in existing:
+                    not_found.append(serial)
+                elif serial in newly_reserved:
+                    to_reserve.append(serial)
+                    newly_reserved.discard(serial)  # a repeated serial counts as already reserved
+                else:
+                    already_reserved.append(serial)
 
             # Record in reservation history
-            cursor.execute("""
-                INSERT INTO inventory_reservations
-                (trade_id, criteria_id, serial, reserved_by, status)
-                VALUES (?, ?, ?, ?, 'active')
-            """, (trade_id, criteria_id, serial, username))
+            cursor.executemany(_RECORD_RESERVATION_SQL,
+                               ((trade_id, criteria_id, serial, username) for serial in to_reserve))
 
-            reserved_count += 1
+            conn.commit()
 
-        conn.commit()
-        conn.close()
+        reserved_count = len(to_reserve)
 
         message = f"Reserved {reserved_count} item(s) for trade {trade_id}"
         if already_reserved:
@@ -2376,6 +3086,41 @@ def reserve_inventory(serials, trade_id, username, criteria_id=None):
         return False, str(e), 0
 
 
+def _release_reserved_serials(cursor, serials, username):
+    """
+    Clear the reservation on each reserved serial and close its history rows.
+
+    Runs inside the caller's write transaction. Returns the serials released.
+    """
+    serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+
+    released = []
+    for batch in _batched(serials):
+        placeholders = ','.join('?' * len(batch))
+        if _HAS_RETURNING:
+            # Clear the reservations and learn which serials changed in one statement
+            cursor.execute(f"""
+                UPDATE inventory SET
+                    is_reserved = 0,
+                    reserved_for_trade_id = NULL
+                WHERE serial IN ({placeholders}) AND is_reserved = 1
+                RETURNING serial
+            """, batch)
+            released.extend(row[0] for row in cursor.fetchall())
+        else:
+            cursor.execute(f"""
+                SELECT serial FROM inventory
+                WHERE serial IN ({placeholders}) AND is_reserved = 1
+            """, batch)
+            found = [(row[0],) for row in cursor.fetchall()]
+            cursor.executemany(_RELEASE_ITEM_SQL, found)
+            released.extend(serial for (serial,) in found)
+
+    # Update reservation history
+    cursor.executemany(_CLOSE_RESERVATION_SQL, ((username, serial) for serial in released))
+    return released
+
+
 def release_reservation(serials, username):
     """
     Release reservation on inventory items.
@@ -2388,34 +3133,15 @@ def release_reservation(serials, username):
         (success, message, count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        released_count = 0
-
-        for serial in serials:
-            # Update inventory
-            cursor.execute("""
-                UPDATE inventory SET
-                    is_reserved = 0,
-                    reserved_for_trade_id = NULL
-                WHERE serial = ? AND is_reserved = 1
-            """, (serial,))
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
 
-            if cursor.rowcount > 0:
-                released_count += 1
+            released = _release_reserved_serials(cursor, serials, username)
 
-                # Update reservation history
-                cursor.execute("""
-                    UPDATE inventory_reservations SET
-                        status = 'released',
-                        released_at = CURRENT_TIMESTAMP,
-                        released_by = ?
-                    WHERE serial = ? AND status = 'active'
-                """, (username, serial))
+            conn.commit()
 
-        conn.commit()
-        conn.close()
+        released_count = len(released)
 
         return True, f"Released {released_count} reservation(s)", released_count
     except Exception as e:
@@ -2423,6 +3149,7 @@ def release_reservation(serials, username):
         return False, str(e), 0
 
 
+@request_memoize
 def get_reserved_inventory(trade_id=None):
     """
     Get all reserved inventory items, optionally filtered by trade.
@@ -2434,47 +3161,27 @@ def get_reserved_inventory(trade_id=None):
         List of reserved inventory items
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-            SELECT id, market, registry, product, project_id, project_type,
-                   protocol, project_name, vintage, serial, is_custody,
-                   is_assigned, trade_id, is_reserved, reserved_for_trade_id
-            FROM inventory
-            WHERE is_reserved = 1
-        """
-        params = []
+        with inventory_read_connection() as conn:
+            conn.row_factory = None  # plain tuples for _inv_row_to_item
+            cursor = conn.cursor()
 
-        if trade_id:
-            query += " AND reserved_for_trade_id = ?"
-            params.append(trade_id)
+            query = """
+                SELECT id, market, registry, product, project_id, project_type,
+                       protocol, project_name, vintage, serial, is_custody,
+                       is_assigned, trade_id, is_reserved, reserved_for_trade_id
+                FROM inventory
+                WHERE is_reserved = 1
+            """
+            params = []
 
-        query += " ORDER BY serial"
+            if trade_id:
+                query += " AND reserved_for_trade_id = ?"
+                params.append(trade_id)
 
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+            query += " ORDER BY serial"
 
-        items = []
-        for row in rows:
-            items.append({
-                '_row_index': row['id'],
-                'Market': row['market'] or '',
-                'Registry': row['registry'] or '',
-                'Product': row['product'] or '',
-                'ProjectID': row['project_id'] or '',
-                'ProjectType': row['project_type'] or '',
-                'Protocol': row['protocol'] or '',
-                'ProjectName': row['project_name'] or '',
-                'Vintage': row['vintage'] or '',
-                'Serial': row['serial'] or '',
-                'IsCustody': row['is_custody'] or '',
-                'IsAssigned': 'True' if row['is_assigned'] else 'False',
-                'TradeID': row['trade_id'] or '',
-                'IsReserved': 'True',
-                'ReservedForTradeID': row['reserved_for_trade_id'] or ''
-            })
+            cursor.execute(query, params)
+            items = [_inv_row_to_item(r) for r in cursor]
 
         return items
     except Exception as e:
@@ -2494,45 +3201,44 @@ def mark_reservation_delivered(serials, username):
         (success, message, count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        delivered_count = 0
-
-        for serial in serials:
-            # Get the reserved trade ID
-            cursor.execute("""
-                SELECT reserved_for_trade_id FROM inventory
-                WHERE serial = ? AND is_reserved = 1
-            """, (serial,))
-            row = cursor.fetchone()
-
-            if row and row['reserved_for_trade_id']:
-                trade_id = row['reserved_for_trade_id']
-
-                # Update inventory - assign to trade and clear reservation
-                cursor.execute("""
-                    UPDATE inventory SET
-                        is_assigned = 1,
-                        trade_id = ?,
-                        is_reserved = 0,
-                        reserved_for_trade_id = NULL
-                    WHERE serial = ?
-                """, (trade_id, serial))
-
-                # Update reservation history
-                cursor.execute("""
-                    UPDATE inventory_reservations SET
-                        status = 'delivered',
-                        released_at = CURRENT_TIMESTAMP,
-                        released_by = ?
-                    WHERE serial = ? AND status = 'active'
-                """, (username, serial))
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+
+            delivered = []
+            for batch in _batched(serials):
+                placeholders = ','.join('?' * len(batch))
+                if _HAS_RETURNING:
+                    # Assign each item to the trade it was reserved for and clear the
+                    # reservation; SET expressions read the row's values from before the update
+                    cursor.execute(f"""
+                        UPDATE inventory SET
+                            is_assigned = 1,
+                            trade_id = reserved_for_trade_id,
+                            is_reserved = 0,
+                            reserved_for_trade_id = NULL
+                        WHERE serial IN ({placeholders}) AND is_reserved = 1
+                          AND reserved_for_trade_id IS NOT NULL AND reserved_for_trade_id != ''
+                        RETURNING serial
+                    """, batch)
+                    delivered.extend(row[0] for row in cursor.fetchall())
+                else:
+                    cursor.execute(f"""
+                        SELECT reserved_for_trade_id, serial FROM inventory
+                        WHERE serial IN ({placeholders}) AND is_reserved = 1
+                    """, batch)
+                    to_deliver = [tuple(row) for row in cursor.fetchall() if row[0]]
+                    cursor.executemany(_DELIVER_ITEM_SQL, to_deliver)
+                    delivered.extend(serial for _, serial in to_deliver)
+
+            # Update reservation history
+            cursor.executemany(_DELIVER_RESERVATION_SQL, ((username, serial) for serial in delivered))
 
-                delivered_count += 1
+            conn.commit()
 
-        conn.commit()
-        conn.close()
+        delivered_count = len(delivered)
 
         return True, f"Delivered {delivered_count} item(s)", delivered_count
     except Exception as e:
@@ -2560,31 +3266,30 @@ def create_trade_criteria(trade_id, direction, quantity, criteria, username):
         (success, criteria_id or error message)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO trade_criteria
-            (trade_id, direction, quantity_required, market, registry, product,
-             project_type, protocol, vintage_from, vintage_to, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            trade_id,
-            direction,
-            quantity,
-            criteria.get('market'),
-            criteria.get('registry'),
-            criteria.get('product'),
-            criteria.get('project_type'),
-            criteria.get('protocol'),
-            criteria.get('vintage_from'),
-            criteria.get('vintage_to'),
-            username
-        ))
+            cursor.execute("""
+                INSERT INTO trade_criteria
+                (trade_id, direction, quantity_required, market, registry, product,
+                 project_type, protocol, vintage_from, vintage_to, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                trade_id,
+                direction,
+                quantity,
+                criteria.get('market'),
+                criteria.get('registry'),
+                criteria.get('product'),
+                criteria.get('project_type'),
+                criteria.get('protocol'),
+                criteria.get('vintage_from'),
+                criteria.get('vintage_to'),
+                username
+            ))
 
-        criteria_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            criteria_id = cursor.lastrowid
+            conn.commit()
 
         return True, criteria_id
     except Exception as e:
@@ -2592,6 +3297,7 @@ def create_trade_criteria(trade_id, direction, quantity, criteria, username):
         return False, str(e)
 
 
+@request_memoize
 def get_trade_criteria(trade_id=None, criteria_id=None, direction=None, status=None):
     """
     Get trade criteria records.
@@ -2606,32 +3312,33 @@ def get_trade_criteria(trade_id=None, criteria_id=None, direction=None, status=N
         List of trade criteria records
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM trade_criteria WHERE 1=1"
-        params = []
-
-        if trade_id:
-            query += " AND trade_id = ?"
-            params.append(trade_id)
-        if criteria_id:
-            query += " AND id = ?"
-            params.append(criteria_id)
-        if direction:
-            query += " AND direction = ?"
-            params.append(direction)
-        if status:
-            query += " AND status = ?"
-            params.append(status)
-
-        query += " ORDER BY created_at DESC"
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-
-        return [dict(row) for row in rows]
+        with inventory_read_connection() as conn:
+            conn.row_factory = None  # plain tuples, zipped with the column names below
+            cursor = conn.cursor()
+
+            query = "SELECT * FROM trade_criteria WHERE 1=1"
+            params = []
+
+            if trade_id:
+                query += " AND trade_id = ?"
+                params.append(trade_id)
+            if criteria_id:
+                query += " AND id = ?"
+                params.append(criteria_id)
+            if direction:
+                query += " AND direction = ?"
+                params.append(direction)
+            if status:
+                query += " AND status = ?"
+                params.append(status)
+
+            query += " ORDER BY created_at DESC"
+
+            cursor.execute(query, params)
+            columns = [d[0] for d in cursor.description]
+            records = [dict(zip(columns, r)) for r in cursor]
+
+        return records
     except Exception as e:
         print(f"Error getting trade criteria: {e}")
         return []
@@ -2649,37 +3356,38 @@ def update_trade_criteria_fulfillment(criteria_id, quantity_fulfilled):
         (success, message)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # Get current criteria
-        cursor.execute("SELECT quantity_required FROM trade_criteria WHERE id = ?", (criteria_id,))
-        row = cursor.fetchone()
-
-        if not row:
-            conn.close()
-            return False, "Criteria not found"
-
-        quantity_required = row['quantity_required']
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Determine new status
-        if quantity_fulfilled >= quantity_required:
-            status = 'fulfilled'
-        elif quantity_fulfilled > 0:
-            status = 'partial'
-        else:
-            status = 'pending'
+            # The status transition is evaluated by SQLite against the stored
+            # quantity_required, so no prior SELECT is needed
+            cursor.execute("""
+                UPDATE trade_criteria SET
+                    quantity_fulfilled = ?1,
+                    status = CASE
+                        WHEN ?1 >= quantity_required THEN 'fulfilled'
+                        WHEN ?1 > 0 THEN 'partial'
+                        ELSE 'pending'
+                    END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?2
+            """ + (" RETURNING quantity_required, status" if _HAS_RETURNING else ""),
+                (quantity_fulfilled, criteria_id))
+
+            if _HAS_RETURNING:
+                row = cursor.fetchone()
+            elif cursor.rowcount:
+                cursor.execute("SELECT quantity_required, status FROM trade_criteria WHERE id = ?",
+                               (criteria_id,))
+                row = cursor.fetchone()
+            else:
+                row = None
 
-        cursor.execute("""
-            UPDATE trade_criteria SET
-                quantity_fulfilled = ?,
-                status = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (quantity_fulfilled, status, criteria_id))
+            if not row:
+                return False, "Criteria not found"
 
-        conn.commit()
-        conn.close()
+            quantity_required, status = row['quantity_required'], row['status']
+            conn.commit()
 
         return True, f"Updated to {quantity_fulfilled}/{quantity_required} ({status})"
     except Exception as e:
@@ -2699,30 +3407,30 @@ def cancel_trade_criteria(criteria_id, username):
         (success, message)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
 
-        # Update criteria status
-        cursor.execute("""
-            UPDATE trade_criteria SET
-                status = 'cancelled',
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (criteria_id,))
+            # Update criteria status
+            cursor.execute("""
+                UPDATE trade_criteria SET
+                    status = 'cancelled',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (criteria_id,))
 
-        # Release any reservations linked to this criteria
-        cursor.execute("""
-            SELECT serial FROM inventory_reservations
-            WHERE criteria_id = ? AND status = 'active'
-        """, (criteria_id,))
-        reserved_serials = [row['serial'] for row in cursor.fetchall()]
+            # Release any reservations linked to this criteria
+            cursor.execute("""
+                SELECT serial FROM inventory_reservations
+                WHERE criteria_id = ? AND status = 'active'
+            """, (criteria_id,))
+            reserved_serials = [row['serial'] for row in cursor.fetchall()]
 
-        conn.commit()
-        conn.close()
+            # Release them in the same transaction as the cancellation
+            if reserved_serials:
+                _release_reserved_serials(cursor, reserved_serials, username)
 
-        # Release the reservations
-        if reserved_serials:
-            release_reservation(reserved_serials, username)
+            conn.commit()
 
         return True, f"Cancelled criteria and released {len(reserved_serials)} reservation(s)"
     except Exception as e:
@@ -2749,30 +3457,29 @@ def create_generic_inventory(trade_id, quantity, criteria, username, criteria_id
         (success, generic_id or error message)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO generic_inventory
-            (trade_id, criteria_id, quantity, market, registry, product,
-             project_type, protocol, vintage, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            trade_id,
-            criteria_id,
-            quantity,
-            criteria.get('market'),
-            criteria.get('registry'),
-            criteria.get('product'),
-            criteria.get('project_type'),
-            criteria.get('protocol'),
-            criteria.get('vintage'),
-            username
-        ))
+            cursor.execute("""
+                INSERT INTO generic_inventory
+                (trade_id, criteria_id, quantity, market, registry, product,
+                 project_type, protocol, vintage, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                trade_id,
+                criteria_id,
+                quantity,
+                criteria.get('market'),
+                criteria.get('registry'),
+                criteria.get('product'),
+                criteria.get('project_type'),
+                criteria.get('protocol'),
+                criteria.get('vintage'),
+                username
+            ))
 
-        generic_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            generic_id = cursor.lastrowid
+            conn.commit()
 
         return True, generic_id
     except Exception as e:
@@ -2780,6 +3487,7 @@ def create_generic_inventory(trade_id, quantity, criteria, username, criteria_id
         return False, str(e)
 
 
+@request_memoize
 def get_generic_inventory(trade_id=None, status=None):
     """
     Get generic inventory positions.
@@ -2792,26 +3500,27 @@ def get_generic_inventory(trade_id=None, status=None):
         List of generic inventory records
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            conn.row_factory = None  # plain tuples, zipped with the column names below
+            cursor = conn.cursor()
 
-        query = "SELECT * FROM generic_inventory WHERE 1=1"
-        params = []
+            query = "SELECT * FROM generic_inventory WHERE 1=1"
+            params = []
 
-        if trade_id:
-            query += " AND trade_id = ?"
-            params.append(trade_id)
-        if status:
-            query += " AND status = ?"
-            params.append(status)
+            if trade_id:
+                query += " AND trade_id = ?"
+                params.append(trade_id)
+            if status:
+                query += " AND status = ?"
+                params.append(status)
 
-        query += " ORDER BY created_at DESC"
+            query += " ORDER BY created_at DESC"
 
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+            cursor.execute(query, params)
+            columns = [d[0] for d in cursor.description]
+            records = [dict(zip(columns, r)) for r in cursor]
 
-        return [dict(row) for row in rows]
+        return records
     except Exception as e:
         print(f"Error getting generic inventory: {e}")
         return []
@@ -2830,72 +3539,101 @@ def fulfill_generic_inventory(generic_id, serials, username):
         (success, message, fulfilled_count)
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # Get generic inventory record
-        cursor.execute("SELECT * FROM generic_inventory WHERE id = ?", (generic_id,))
-        generic = cursor.fetchone()
-
-        if not generic:
-            conn.close()
-            return False, "Generic inventory not found", 0
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
 
-        trade_id = generic['trade_id']
-        current_fulfilled = generic['fulfilled_quantity'] or 0
-        quantity_needed = generic['quantity']
+            # Get generic inventory record
+            cursor.execute("SELECT * FROM generic_inventory WHERE id = ?", (generic_id,))
+            generic = cursor.fetchone()
 
-        fulfilled_count = 0
+            if not generic:
+                return False, "Generic inventory not found", 0
 
-        for serial in serials:
-            if current_fulfilled + fulfilled_count >= quantity_needed:
-                break
+            trade_id = generic['trade_id']
+            current_fulfilled = generic['fulfilled_quantity'] or 0
+            quantity_needed = generic['quantity']
 
-            # Assign the inventory item to the trade
-            cursor.execute("""
-                UPDATE inventory SET
-                    is_assigned = 1,
-                    trade_id = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE serial = ? AND (is_assigned = 0 OR is_assigned IS NULL)
-            """, (trade_id, serial))
-
-            if cursor.rowcount > 0:
-                fulfilled_count += 1
-
-        # Update generic inventory
-        new_fulfilled = current_fulfilled + fulfilled_count
-        if new_fulfilled >= quantity_needed:
-            status = 'fulfilled'
-        elif new_fulfilled > 0:
-            status = 'partial'
-        else:
-            status = 'pending'
+            serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+            remaining = max(quantity_needed - current_fulfilled, 0)
 
-        cursor.execute("""
-            UPDATE generic_inventory SET
-                fulfilled_quantity = ?,
-                status = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (new_fulfilled, status, generic_id))
+            if _HAS_RETURNING:
+                # Pick the first `remaining` free serials in the order given and
+                # assign them in one statement
+                cursor.execute("""
+                    WITH candidates AS (
+                        SELECT j.value AS serial
+                        FROM json_each(?) AS j
+                        JOIN inventory ON inventory.serial = j.value
+                        WHERE inventory.is_assigned = 0 OR inventory.is_assigned IS NULL
+                        ORDER BY j.key
+                        LIMIT ?
+                    )
+                    UPDATE inventory SET
+                        is_assigned = 1,
+                        trade_id = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE serial IN (SELECT serial FROM candidates)
+                    RETURNING serial
+                """, (_json_dumps(serials), remaining, trade_id))
+                fulfilled_count = len(cursor.fetchall())
+            else:
+                # Find which of the serials are still free to assign
+                available = set()
+                for batch in _batched(serials):
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(f"""
+                        SELECT serial FROM inventory
+                        WHERE serial IN ({placeholders}) AND (is_assigned = 0 OR is_assigned IS NULL)
+                    """, batch)
+                    available.update(row[0] for row in cursor.fetchall())
+
+                # Take them in the order given, up to the quantity still needed
+                to_assign = [serial for serial in serials if serial in available][:remaining]
+
+                # Assign the inventory items to the trade
+                cursor.executemany("""
+                    UPDATE inventory SET
+                        is_assigned = 1,
+                        trade_id = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE serial = ? AND (is_assigned = 0 OR is_assigned IS NULL)
+                """, [(trade_id, serial) for serial in to_assign])
+
+                fulfilled_count = len(to_assign)
+
+            # Update generic inventory
+            new_fulfilled = current_fulfilled + fulfilled_count
+            if new_fulfilled >= quantity_needed:
+                status = 'fulfilled'
+            elif new_fulfilled > 0:
+                status = 'partial'
+            else:
+                status = 'pending'
 
-        # Also update linked trade_criteria if exists
-        if generic['criteria_id']:
             cursor.execute("""
-                UPDATE trade_criteria SET
-                    quantity_fulfilled = quantity_fulfilled + ?,
-                    status = CASE
-                        WHEN quantity_fulfilled + ? >= quantity_required THEN 'fulfilled'
-                        WHEN quantity_fulfilled + ? > 0 THEN 'partial'
-                        ELSE 'pending'
-                    END,
+                UPDATE generic_inventory SET
+                    fulfilled_quantity = ?,
+                    status = ?,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
-            """, (fulfilled_count, fulfilled_count, fulfilled_count, generic['criteria_id']))
+            """, (new_fulfilled, status, generic_id))
 
-        conn.commit()
-        conn.close()
+            # Also update linked trade_criteria if exists
+            if generic['criteria_id']:
+                cursor.execute("""
+                    UPDATE trade_criteria SET
+                        quantity_fulfilled = quantity_fulfilled + ?,
+                        status = CASE
+                            WHEN quantity_fulfilled + ? >= quantity_required THEN 'fulfilled'
+                            WHEN quantity_fulfilled + ? > 0 THEN 'partial'
+                            ELSE 'pending'
+                        END,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (fulfilled_count, fulfilled_count, fulfilled_count, generic['criteria_id']))
+
+            conn.commit()
 
         return True, f"Fulfilled {fulfilled_count} item(s). Total: {new_fulfilled}/{quantity_needed}", fulfilled_count
     except Exception as e:
@@ -2903,6 +3641,7 @@ def fulfill_generic_inventory(generic_id, serials, username):
         return False, str(e), 0
 
 
+@request_memoize
 def get_pending_generic_positions():
     """
     Get all pending or partially fulfilled generic positions.
@@ -2911,25 +3650,27 @@ def get_pending_generic_positions():
         List of generic inventory records that need fulfillment
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT g.*,
-                   (g.quantity - COALESCE(g.fulfilled_quantity, 0)) as remaining
-            FROM generic_inventory g
-            WHERE g.status IN ('pending', 'partial')
-            ORDER BY g.created_at ASC
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        with inventory_read_connection() as conn:
+            conn.row_factory = None  # plain tuples, zipped with the column names below
+            cursor = conn.cursor()
 
-        return [dict(row) for row in rows]
+            cursor.execute("""
+                SELECT g.*,
+                       (g.quantity - COALESCE(g.fulfilled_quantity, 0)) as remaining
+                FROM generic_inventory g
+                WHERE g.status IN ('pending', 'partial')
+                ORDER BY g.created_at ASC
+            """)
+            columns = [d[0] for d in cursor.description]
+            records = [dict(zip(columns, r)) for r in cursor]
+
+        return records
     except Exception as e:
         print(f"Error getting pending generic positions: {e}")
         return []
 
 
+@request_memoize
 def get_reservation_summary():
     """
     Get a summary of all reservations grouped by trade.
@@ -2938,18 +3679,17 @@ def get_reservation_summary():
         Dict with trade_id keys and reservation counts/details
     """
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT reserved_for_trade_id as trade_id,
-                   COUNT(*) as reserved_count
-            FROM inventory
-            WHERE is_reserved = 1
-            GROUP BY reserved_for_trade_id
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+            cursor.execute("""
+                SELECT reserved_for_trade_id as trade_id,
+                       COUNT(*) as reserved_count
+                FROM inventory
+                WHERE is_reserved = 1
+                GROUP BY reserved_for_trade_id
+            """)
+            rows = cursor.fetchall()
 
         return {row['trade_id']: row['reserved_count'] for row in rows}
     except Exception as e:
@@ -2957,9 +3697,50 @@ def get_reservation_summary():
         return {}
 
 
-# =============================================================================
-# CRITERIA ALLOCATION OPTIMIZER
-# =============================================================================
+# =============================================================================
+# CRITERIA ALLOCATION OPTIMIZER
+# =============================================================================
+
+_CRITERIA_MATCH_FIELDS = ('market', 'registry', 'product', 'project_type', 'protocol', 'project_id')
+# Every item field _compile_criteria predicates read
+_CRITERIA_SIGNATURE_FIELDS = _CRITERIA_MATCH_FIELDS + ('vintage',)
+
+
+def _compile_criteria(criteria):
+    """
+    Turn a criteria dict into a predicate over inventory item dicts.
+
+    The criteria keys are read once here instead of on every item, which
+    matters in the allocation loops that test each item against each criteria.
+    """
+    checks = tuple((key, criteria[key]) for key in _CRITERIA_MATCH_FIELDS if criteria.get(key))
+    vintage_from = str(criteria['vintage_from']) if criteria.get('vintage_from') else None
+    vintage_to = str(criteria['vintage_to']) if criteria.get('vintage_to') else None
+    check_vintage = bool(vintage_from or vintage_to)
+
+    def matches(item):
+        for key, expected in checks:
+            if item.get(key) != expected:
+                return False
+
+        if not check_vintage:
+            return True
+
+        # Items without a vintage pass the vintage range. Vintage is a TEXT
+        # column, so only values from other sources need converting.
+        item_vintage = item.get('vintage')
+        if item_vintage:
+            if type(item_vintage) is not str:
+                item_vintage = str(item_vintage)
+            if vintage_from and item_vintage < vintage_from:
+                return False
+            if vintage_to and item_vintage > vintage_to:
+                return False
+
+        return True
+
+    return matches
+
 
 def check_inventory_matches_criteria(item, criteria):
     """
@@ -2972,30 +3753,29 @@ def check_inventory_matches_criteria(item, criteria):
     Returns:
         True if item matches all specified criteria
     """
-    # Check each criteria field
-    if criteria.get('market') and item.get('market') != criteria.get('market'):
-        return False
-    if criteria.get('registry') and item.get('registry') != criteria.get('registry'):
-        return False
-    if criteria.get('product') and item.get('product') != criteria.get('product'):
-        return False
-    if criteria.get('project_type') and item.get('project_type') != criteria.get('project_type'):
-        return False
-    if criteria.get('protocol') and item.get('protocol') != criteria.get('protocol'):
-        return False
-    if criteria.get('project_id') and item.get('project_id') != criteria.get('project_id'):
-        return False
+    return _compile_criteria(criteria)(item)
 
-    # Check vintage range
-    item_vintage = item.get('vintage', '')
-    if criteria.get('vintage_from') and item_vintage:
-        if str(item_vintage) < str(criteria.get('vintage_from')):
-            return False
-    if criteria.get('vintage_to') and item_vintage:
-        if str(item_vintage) > str(criteria.get('vintage_to')):
-            return False
 
-    return True
+def _criteria_match_clause(criteria):
+    """
+    SQL form of check_inventory_matches_criteria for a trade criteria record.
+
+    Returns (sql, params) where sql is a run of " AND ..." conditions. As in
+    the Python check, items without a vintage pass the vintage range.
+    """
+    sql = ""
+    params = []
+    for key in _CRITERIA_MATCH_FIELDS:
+        if criteria.get(key):
+            sql += f" AND {key} = ?"
+            params.append(criteria[key])
+    if criteria.get('vintage_from'):
+        sql += " AND (vintage IS NULL OR vintage = '' OR vintage >= ?)"
+        params.append(str(criteria['vintage_from']))
+    if criteria.get('vintage_to'):
+        sql += " AND (vintage IS NULL OR vintage = '' OR vintage <= ?)"
+        params.append(str(criteria['vintage_to']))
+    return sql, params
 
 
 def get_available_after_criteria_claims(search_criteria):
@@ -3017,124 +3797,104 @@ def get_available_after_criteria_claims(search_criteria):
         - 'available': True available after claims
         - 'criteria_claims': List of criteria claiming this inventory
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # Get all available inventory matching search criteria (not reserved, not assigned)
-        query = """
-            SELECT id, market, registry, product, project_id, project_type,
-                   protocol, vintage, serial
-            FROM inventory
-            WHERE (is_reserved = 0 OR is_reserved IS NULL)
-              AND (is_assigned = 0 OR is_assigned IS NULL)
-        """
-        params = []
-
-        if search_criteria.get('registry'):
-            query += " AND registry = ?"
-            params.append(search_criteria['registry'])
-        if search_criteria.get('product'):
-            query += " AND product = ?"
-            params.append(search_criteria['product'])
-        if search_criteria.get('project_type'):
-            query += " AND project_type = ?"
-            params.append(search_criteria['project_type'])
-        if search_criteria.get('protocol'):
-            query += " AND protocol = ?"
-            params.append(search_criteria['protocol'])
-        if search_criteria.get('project_id'):
-            query += " AND project_id = ?"
-            params.append(search_criteria['project_id'])
-        if search_criteria.get('vintage_from'):
-            query += " AND vintage >= ?"
-            params.append(search_criteria['vintage_from'])
-        if search_criteria.get('vintage_to'):
-            query += " AND vintage <= ?"
-            params.append(search_criteria['vintage_to'])
-
-        query += " ORDER BY vintage, serial"
-        cursor.execute(query, params)
-        matching_inventory = [dict(row) for row in cursor.fetchall()]
-        total_matching = len(matching_inventory)
-
-        if total_matching == 0:
-            conn.close()
-            return {
-                'total_matching': 0,
-                'claimed_by_criteria': 0,
-                'available': 0,
-                'criteria_claims': []
-            }
-
-        # Get all active criteria-only allocations (FIFO order)
-        cursor.execute("""
-            SELECT * FROM trade_criteria
-            WHERE status = 'criteria_only' AND direction = 'sell'
-            ORDER BY created_at ASC
-        """)
-        all_criteria = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        conn = None
-
-        if not all_criteria:
-            return {
-                'total_matching': total_matching,
-                'claimed_by_criteria': 0,
-                'available': total_matching,
-                'criteria_claims': []
-            }
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
+
+            # One read transaction: the claim queries all see the same snapshot
+            cursor.execute("BEGIN")
+
+            # Get all available inventory matching search criteria (not reserved, not assigned)
+            search_sql = "state = 0"
+            search_params = []
+            for key, clause in _CRITERIA_FILTERS:
+                if key != 'market' and search_criteria.get(key):
+                    search_sql += " AND " + clause
+                    search_params.append(search_criteria[key])
+
+            # Only count them for now; the rows are read once, straight into
+            # the output list, after the claims are known
+            cursor.execute(f"SELECT COUNT(*) FROM inventory WHERE {search_sql}", search_params)
+            total_matching = cursor.fetchone()[0]
+
+            if total_matching == 0:
+                return {
+                    'total_matching': 0,
+                    'claimed_by_criteria': 0,
+                    'available': 0,
+                    'criteria_claims': []
+                }
 
-        # Simulate FIFO allocation
-        allocated_ids = set()
-        item_claims = {}  # Maps item_id to claiming trade_id
-        criteria_claims = []
+            # Get all active criteria-only allocations (FIFO order)
+            cursor.execute("""
+                SELECT * FROM trade_criteria
+                WHERE status = 'criteria_only' AND direction = 'sell'
+                ORDER BY created_at ASC
+            """)
+            all_criteria = [dict(row) for row in cursor.fetchall()]
+
+            if not all_criteria:
+                return {
+                    'total_matching': total_matching,
+                    'claimed_by_criteria': 0,
+                    'available': total_matching,
+                    'criteria_claims': []
+                }
 
-        for crit in all_criteria:
-            # Find inventory items that match this criteria AND our search criteria
-            matching_for_crit = []
-            for item in matching_inventory:
-                if item['id'] not in allocated_ids:
-                    if check_inventory_matches_criteria(item, crit):
-                        matching_for_crit.append(item['id'])
-
-            # This criteria claims up to its quantity_required
-            qty_to_claim = min(crit['quantity_required'], len(matching_for_crit))
-
-            if qty_to_claim > 0:
-                # Mark items as allocated (FIFO - take first items)
-                for i in range(qty_to_claim):
-                    item_id = matching_for_crit[i]
-                    allocated_ids.add(item_id)
-                    item_claims[item_id] = crit['trade_id']
-
-                criteria_claims.append({
-                    'trade_id': crit['trade_id'],
-                    'criteria_id': crit['id'],
-                    'quantity_claimed': qty_to_claim,
-                    'registry': crit.get('registry'),
-                    'vintage_from': crit.get('vintage_from'),
-                    'vintage_to': crit.get('vintage_to')
+            # Simulate FIFO allocation: each criteria claims the first
+            # quantity_required unclaimed matches, found by SQLite with LIMIT
+            allocated_ids = []
+            item_claims = {}  # Maps item_id to claiming trade_id
+            criteria_claims = []
+
+            for crit in all_criteria:
+                crit_sql, crit_params = _criteria_match_clause(crit)
+                cursor.execute(f"""
+                    SELECT id FROM inventory
+                    WHERE {search_sql}{crit_sql}
+                      AND id NOT IN (SELECT value FROM json_each(?))
+                    ORDER BY vintage, serial
+                    LIMIT ?
+                """, search_params + crit_params + [_json_dumps(allocated_ids), crit['quantity_required']])
+                claimed = [row[0] for row in cursor.fetchall()]
+
+                if claimed:
+                    allocated_ids.extend(claimed)
+                    for item_id in claimed:
+                        item_claims[item_id] = crit['trade_id']
+
+                    criteria_claims.append({
+                        'trade_id': crit['trade_id'],
+                        'criteria_id': crit['id'],
+                        'quantity_claimed': len(claimed),
+                        'registry': crit.get('registry'),
+                        'vintage_from': crit.get('vintage_from'),
+                        'vintage_to': crit.get('vintage_to')
+                    })
+
+            # Build inventory list with status
+            cursor.execute(f"""
+                SELECT id, registry, product, project_id, vintage, serial
+                FROM inventory
+                WHERE {search_sql}
+                ORDER BY vintage, serial
+            """, search_params)
+            inventory_items = []
+            for item_id, registry, product, project_id, vintage, serial in cursor:
+                claiming_trade = item_claims.get(item_id)
+                inventory_items.append({
+                    'serial': serial,
+                    'registry': registry,
+                    'product': product,
+                    'project_id': project_id,
+                    'vintage': vintage,
+                    'status': 'claimed' if claiming_trade else 'available',
+                    'claimed_by_trade': claiming_trade
                 })
 
         claimed_by_criteria = len(allocated_ids)
         available = total_matching - claimed_by_criteria
 
-        # Build inventory list with status
-        inventory_items = []
-        for item in matching_inventory:
-            claiming_trade = item_claims.get(item['id'])
-            inventory_items.append({
-                'serial': item.get('serial', ''),
-                'registry': item.get('registry', ''),
-                'product': item.get('product', ''),
-                'project_id': item.get('project_id', ''),
-                'vintage': item.get('vintage', ''),
-                'status': 'claimed' if claiming_trade else 'available',
-                'claimed_by_trade': claiming_trade
-            })
-
         return {
             'total_matching': total_matching,
             'claimed_by_criteria': claimed_by_criteria,
@@ -3144,8 +3904,6 @@ def get_available_after_criteria_claims(search_criteria):
         }
 
     except Exception as e:
-        if conn:
-            conn.close()
         print(f"Error in get_available_after_criteria_claims: {e}")
         return {
             'total_matching': 0,
@@ -3156,6 +3914,64 @@ def get_available_after_criteria_claims(search_criteria):
         }
 
 
+def _fifo_allocate(match_lists, required, size):
+    """
+    Greedy FIFO allocation kernel of the criteria allocation check.
+
+    match_lists[c] holds the item indexes (0 <= index < size) matching
+    criteria c in FIFO order and required[c] its quantity; criteria are served
+    in list order and each takes the first items no earlier criteria claimed.
+
+    Returns one list per criteria of the indexes it claimed (shorter than
+    required[c] when the criteria runs short).
+    """
+    allocated = bytearray(size)  # one flag per item, no hashing
+    claims = []
+    for indexes, needed in zip(match_lists, required):
+        if not indexes or needed <= 0:
+            claims.append([])  # no match (or nothing to claim): nothing to scan
+            continue
+        # Only the first `needed` unallocated items are materialised; the rest
+        # of the list is walked only when the criteria cannot be satisfied
+        claimed = list(islice((idx for idx in indexes if not allocated[idx]), needed))
+        for idx in claimed:
+            allocated[idx] = 1
+        claims.append(claimed)
+    return claims
+
+
+def _build_criteria_matches(all_criteria, available_inventory):
+    """
+    Build the matching matrix of get_criteria_allocation_status.
+
+    Returns {criteria_id: [positions in available_inventory of the matching
+    items]} with every list in FIFO order, so allocation can track items in a
+    flat bytearray.
+    """
+    # Serials of one project and vintage agree on every field a criteria
+    # looks at, so each criteria is tested once per distinct signature and
+    # the matching groups' positions are merged back into FIFO order
+    signature_groups = {}
+    for idx, row in enumerate(available_inventory):
+        signature_groups.setdefault(row[:-1], []).append(idx)
+    signature_items = [(dict(zip(_CRITERIA_SIGNATURE_FIELDS, signature)), indexes)
+                       for signature, indexes in signature_groups.items()]
+
+    criteria_matches = {}
+    for crit in all_criteria:
+        matches = _compile_criteria(crit)
+        criteria_matches[crit['id']] = sorted(chain.from_iterable(
+            indexes for item, indexes in signature_items if matches(item)
+        ))
+    return criteria_matches
+
+
+# [version, all_criteria, available_inventory, criteria_matches] of the last
+# allocation check, reused while the 'allocation' change counter is unchanged.
+# Treated as read-only by get_criteria_allocation_status.
+_allocation_inputs = [None, None, None, None]
+_allocation_inputs_lock = threading.Lock()
+
 def get_criteria_allocation_status():
     """
     Optimize and check allocation feasibility for all criteria-only trades.
@@ -3169,30 +3985,45 @@ def get_criteria_allocation_status():
         - 'total_required': int
         - 'conflicts': list of conflicting trade pairs
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get all criteria_only criteria (active sell generic trades)
-        cursor.execute("""
-            SELECT * FROM trade_criteria
-            WHERE status = 'criteria_only' AND direction = 'sell'
-            ORDER BY created_at ASC
-        """)
-        all_criteria = [dict(row) for row in cursor.fetchall()]
+            # Read criteria and inventory in one transaction, so both come from
+            # the same snapshot even while reservations are being written
+            cursor.execute("BEGIN")
 
-        # Get all available inventory (not reserved, not assigned)
-        cursor.execute("""
-            SELECT id, market, registry, product, project_id, project_type,
-                   protocol, vintage, serial
-            FROM inventory
-            WHERE (is_reserved = 0 OR is_reserved IS NULL)
-              AND (is_assigned = 0 OR is_assigned IS NULL)
-        """)
-        available_inventory = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        conn = None  # Mark as closed
+            cursor.execute("SELECT version FROM change_counters WHERE name = 'allocation'")
+            row = cursor.fetchone()
+            version = row[0] if row else None
+
+            with _allocation_inputs_lock:
+                cached = _allocation_inputs if version is not None and _allocation_inputs[0] == version else None
+
+            if cached:
+                all_criteria, available_inventory, criteria_matches = cached[1:]
+            else:
+                # Get all criteria_only criteria (active sell generic trades)
+                cursor.execute("""
+                    SELECT * FROM trade_criteria
+                    WHERE status = 'criteria_only' AND direction = 'sell'
+                    ORDER BY created_at ASC
+                """)
+                all_criteria = [dict(row) for row in cursor.fetchall()]
+
+                # Get all available inventory (not reserved, not assigned) in FIFO
+                # order, so every criteria_matches list below is already ordered too.
+                # Plain tuples: the _CRITERIA_SIGNATURE_FIELDS columns, then serial.
+                cursor.row_factory = None
+                cursor.execute("""
+                    SELECT market, registry, product, project_type, protocol, project_id,
+                           vintage, serial
+                    FROM inventory
+                    WHERE state = 0
+                    ORDER BY vintage, serial
+                """)
+                available_inventory = cursor.fetchall()
+            conn.commit()
 
         if not all_criteria:
             return {
@@ -3203,17 +4034,12 @@ def get_criteria_allocation_status():
                 'allocation_possible': True
             }
 
-        # Build matching matrix: which inventory items can satisfy which criteria
-        # criteria_matches[criteria_id] = [list of inventory item ids that match]
-        criteria_matches = {}
-        for crit in all_criteria:
-            criteria_matches[crit['id']] = []
-            for item in available_inventory:
-                if check_inventory_matches_criteria(item, crit):
-                    criteria_matches[crit['id']].append(item['id'])
+        if not cached:
+            criteria_matches = _build_criteria_matches(all_criteria, available_inventory)
+            if version is not None:
+                with _allocation_inputs_lock:
+                    _allocation_inputs[:] = [version, all_criteria, available_inventory, criteria_matches]
 
-        # Track allocated inventory
-        allocated = set()
         trade_status = {}
         conflicts = []
 
@@ -3266,33 +4092,25 @@ def get_criteria_allocation_status():
                 if trade_status[trade_id]['status'] == 'sufficient':
                     trade_status[trade_id]['status'] = 'insufficient'
 
-        # Build id to serial mapping
-        id_to_serial = {item['id']: item['serial'] for item in available_inventory}
-
         # Second pass: Simulate allocation in FIFO order (oldest criteria first)
         # This ensures older trades get priority - newer trades causing conflicts are marked
         # all_criteria is already ordered by created_at ASC from the SQL query
         allocation_success = True
-        allocated = set()  # Set of item IDs
-        allocated_serials = set()  # Set of serial numbers
+        # Each item is claimed at most once, so serials are never repeated
+        allocated_serials = []
+
+        claims = _fifo_allocate([criteria_matches[crit['id']] for crit in all_criteria],
+                                [crit['quantity_required'] for crit in all_criteria],
+                                len(available_inventory))
 
-        for crit in all_criteria:  # Process in creation order (oldest first)
+        for crit, available_items in zip(all_criteria, claims):  # creation order (oldest first)
             trade_id = crit['trade_id']
             criteria_id = crit['id']
             required = crit['quantity_required']
 
-            # Get unallocated items that match this criteria
-            available_items = [
-                item_id for item_id in criteria_matches[criteria_id]
-                if item_id not in allocated
-            ]
+            allocated_serials.extend(available_inventory[idx][-1] for idx in available_items)
 
             if len(available_items) >= required:
-                # Allocate required items
-                for item_id in available_items[:required]:
-                    allocated.add(item_id)
-                    if item_id in id_to_serial:
-                        allocated_serials.add(id_to_serial[item_id])
                 criteria_status[criteria_id]['allocated'] = required
             else:
                 # Not enough - mark as conflict
@@ -3304,37 +4122,45 @@ def get_criteria_allocation_status():
                 # Update trade status to conflict
                 trade_status[trade_id]['status'] = 'conflict'
 
-                # Allocate what we can
-                for item_id in available_items:
-                    allocated.add(item_id)
-                    if item_id in id_to_serial:
-                        allocated_serials.add(id_to_serial[item_id])
-
         # Detect specific conflicts (which trades compete for same inventory)
         # Also track which trades each trade conflicts with
         trade_conflicts = {}  # trade_id -> list of conflicting trade_ids
 
-        for i, crit1 in enumerate(all_criteria):
-            for crit2 in all_criteria[i+1:]:
-                # Check if criteria overlap
-                overlap = set(criteria_matches[crit1['id']]) & set(criteria_matches[crit2['id']])
-                if overlap:
-                    combined_need = crit1['quantity_required'] + crit2['quantity_required']
-                    if combined_need > len(overlap):
-                        # These criteria compete and may not both be satisfiable
-                        conflicts.append({
-                            'trade1': crit1['trade_id'],
-                            'trade2': crit2['trade_id'],
-                            'overlap_count': len(overlap),
-                            'combined_need': combined_need
-                        })
-                        # Track conflicts for each trade
-                        if crit1['trade_id'] not in trade_conflicts:
-                            trade_conflicts[crit1['trade_id']] = []
-                        if crit2['trade_id'] not in trade_conflicts:
-                            trade_conflicts[crit2['trade_id']] = []
-                        trade_conflicts[crit1['trade_id']].append(crit2['trade_id'])
-                        trade_conflicts[crit2['trade_id']].append(crit1['trade_id'])
+        # Invert criteria_matches (item -> positions of the criteria it
+        # matches) and count overlaps per criteria pair from the items' side,
+        # so only pairs that actually share inventory are ever visited.
+        # Conflicts are only shown for trades in 'conflict' status, which a
+        # successful FIFO allocation never produces, so skip the work then.
+        item_criteria = {}
+        if not allocation_success:
+            for pos, crit in enumerate(all_criteria):
+                for idx in criteria_matches[crit['id']]:
+                    item_criteria.setdefault(idx, []).append(pos)
+
+        overlap_counts = Counter()
+        for positions in item_criteria.values():
+            if len(positions) > 1:
+                overlap_counts.update(combinations(positions, 2))
+
+        for i, j in sorted(overlap_counts):
+            crit1, crit2 = all_criteria[i], all_criteria[j]
+            overlap_count = overlap_counts[i, j]
+            combined_need = crit1['quantity_required'] + crit2['quantity_required']
+            if combined_need > overlap_count:
+                # These criteria compete and may not both be satisfiable
+                conflicts.append({
+                    'trade1': crit1['trade_id'],
+                    'trade2': crit2['trade_id'],
+                    'overlap_count': overlap_count,
+                    'combined_need': combined_need
+                })
+                # Track conflicts for each trade
+                if crit1['trade_id'] not in trade_conflicts:
+                    trade_conflicts[crit1['trade_id']] = []
+                if crit2['trade_id'] not in trade_conflicts:
+                    trade_conflicts[crit2['trade_id']] = []
+                trade_conflicts[crit1['trade_id']].append(crit2['trade_id'])
+                trade_conflicts[crit2['trade_id']].append(crit1['trade_id'])
 
         # Add conflicting trades to each trade's status
         for trade_id, conflicting_trades in trade_conflicts.items():
@@ -3350,7 +4176,7 @@ def get_criteria_allocation_status():
             'total_required': total_required,
             'conflicts': conflicts,
             'allocation_possible': allocation_success,
-            'allocated_serials': list(allocated_serials)
+            'allocated_serials': allocated_serials
         }
 
     except Exception as e:
@@ -3365,11 +4191,15 @@ def get_criteria_allocation_status():
             'allocation_possible': True,
             'error': str(e)
         }
-    finally:
-        if conn:
-            conn.close()
 
 
+_ASSIGN_CRITERIA_SQL = """
+    INSERT INTO trade_criteria
+    (trade_id, direction, quantity_required, market, registry, product,
+     project_type, protocol, project_id, vintage_from, vintage_to, status, created_by)
+    VALUES (?, 'sell', ?, ?, ?, ?, ?, ?, ?, ?, ?, 'criteria_only', ?)
+"""
+
 def assign_criteria_only(trade_id, quantity, criteria, username):
     """
     Assign criteria to a trade without reserving specific inventory.
@@ -3385,50 +4215,56 @@ def assign_criteria_only(trade_id, quantity, criteria, username):
     Returns:
         (success, message, criteria_id)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Always insert new criteria (allows multiple criteria per trade)
-        cursor.execute("""
-            INSERT INTO trade_criteria
-            (trade_id, direction, quantity_required, market, registry, product,
-             project_type, protocol, project_id, vintage_from, vintage_to, status, created_by)
-            VALUES (?, 'sell', ?, ?, ?, ?, ?, ?, ?, ?, ?, 'criteria_only', ?)
-        """, (
-            str(trade_id),
-            quantity,
-            criteria.get('market'),
-            criteria.get('registry'),
-            criteria.get('product'),
-            criteria.get('project_type'),
-            criteria.get('protocol'),
-            criteria.get('project_id'),
-            criteria.get('vintage_from'),
-            criteria.get('vintage_to'),
-            username
-        ))
-        criteria_id = cursor.lastrowid
+            params = (
+                str(trade_id),
+                quantity,
+                criteria.get('market'),
+                criteria.get('registry'),
+                criteria.get('product'),
+                criteria.get('project_type'),
+                criteria.get('protocol'),
+                criteria.get('project_id'),
+                criteria.get('vintage_from'),
+                criteria.get('vintage_to'),
+                username
+            )
 
-        # Count how many criteria this trade now has
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM trade_criteria
-            WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
-        """, (str(trade_id),))
-        count = cursor.fetchone()['count']
+            # Always insert new criteria (allows multiple criteria per trade)
+            if _HAS_RETURNING:
+                # The trade's criteria count comes back with the new id: this row
+                # plus the earlier (lower id) criteria_only rows of the trade
+                cursor.execute(_ASSIGN_CRITERIA_SQL + """
+                    RETURNING id, 1 + (
+                        SELECT COUNT(*) FROM trade_criteria AS earlier
+                        WHERE earlier.trade_id = trade_criteria.trade_id
+                          AND earlier.direction = 'sell' AND earlier.status = 'criteria_only'
+                          AND earlier.id < trade_criteria.id
+                    )
+                """, params)
+                criteria_id, count = cursor.fetchone()
+            else:
+                cursor.execute(_ASSIGN_CRITERIA_SQL, params)
+                criteria_id = cursor.lastrowid
 
-        message = f"Added criteria #{count} to trade {trade_id}"
+                # Count how many criteria this trade now has
+                cursor.execute("""
+                    SELECT COUNT(*) as count FROM trade_criteria
+                    WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
+                """, (str(trade_id),))
+                count = cursor.fetchone()['count']
 
-        conn.commit()
+            conn.commit()
+
+        message = f"Added criteria #{count} to trade {trade_id}"
         return True, message, criteria_id
 
     except Exception as e:
         print(f"Error assigning criteria: {e}")
         return False, str(e), None
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_trade_criteria_summary():
@@ -3438,48 +4274,44 @@ def get_trade_criteria_summary():
     Returns:
         Dict mapping trade_id to list of criteria details
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT * FROM trade_criteria
-            WHERE status = 'criteria_only'
-            ORDER BY trade_id, created_at
-        """)
-        rows = cursor.fetchall()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        result = {}
-        for row in rows:
-            trade_id = row['trade_id']
-            criteria = {
-                'criteria_id': row['id'],
-                'quantity': row['quantity_required'],
-                'quantity_required': row['quantity_required'],
-                'direction': row['direction'],
-                'market': row['market'],
-                'registry': row['registry'],
-                'product': row['product'],
-                'project_type': row['project_type'],
-                'protocol': row['protocol'],
-                'project_id': row['project_id'],
-                'vintage_from': row['vintage_from'],
-                'vintage_to': row['vintage_to'],
-                'created_at': row['created_at']
-            }
-            if trade_id not in result:
-                result[trade_id] = []
-            result[trade_id].append(criteria)
+            cursor.execute("""
+                SELECT * FROM trade_criteria
+                WHERE status = 'criteria_only'
+                ORDER BY trade_id, created_at
+            """)
+            rows = cursor.fetchall()
+
+            result = {}
+            for row in rows:
+                trade_id = row['trade_id']
+                criteria = {
+                    'criteria_id': row['id'],
+                    'quantity': row['quantity_required'],
+                    'quantity_required': row['quantity_required'],
+                    'direction': row['direction'],
+                    'market': row['market'],
+                    'registry': row['registry'],
+                    'product': row['product'],
+                    'project_type': row['project_type'],
+                    'protocol': row['protocol'],
+                    'project_id': row['project_id'],
+                    'vintage_from': row['vintage_from'],
+                    'vintage_to': row['vintage_to'],
+                    'created_at': row['created_at']
+                }
+                if trade_id not in result:
+                    result[trade_id] = []
+                result[trade_id].append(criteria)
 
-        return result
+            return result
 
     except Exception as e:
         print(f"Error getting trade criteria summary: {e}")
         return {}
-    finally:
-        if conn:
-            conn.close()
 
 
 def remove_trade_criteria(trade_id, username):
@@ -3493,30 +4325,26 @@ def remove_trade_criteria(trade_id, username):
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            DELETE FROM trade_criteria
-            WHERE trade_id = ? AND status = 'criteria_only'
-        """, (str(trade_id),))
+            cursor.execute("""
+                DELETE FROM trade_criteria
+                WHERE trade_id = ? AND status = 'criteria_only'
+            """, (str(trade_id),))
 
-        deleted = cursor.rowcount
-        conn.commit()
+            deleted = cursor.rowcount
+            conn.commit()
 
-        if deleted > 0:
-            return True, f"Removed criteria from trade {trade_id}"
-        else:
-            return False, "No criteria found for this trade"
+            if deleted > 0:
+                return True, f"Removed criteria from trade {trade_id}"
+            else:
+                return False, "No criteria found for this trade"
 
     except Exception as e:
         print(f"Error removing trade criteria: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def remove_single_criteria(criteria_id, username):
@@ -3530,30 +4358,26 @@ def remove_single_criteria(criteria_id, username):
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            DELETE FROM trade_criteria
-            WHERE id = ? AND status = 'criteria_only'
-        """, (criteria_id,))
+            cursor.execute("""
+                DELETE FROM trade_criteria
+                WHERE id = ? AND status = 'criteria_only'
+            """, (criteria_id,))
 
-        deleted = cursor.rowcount
-        conn.commit()
+            deleted = cursor.rowcount
+            conn.commit()
 
-        if deleted > 0:
-            return True, f"Removed criteria {criteria_id}"
-        else:
-            return False, "Criteria not found"
+            if deleted > 0:
+                return True, f"Removed criteria {criteria_id}"
+            else:
+                return False, "Criteria not found"
 
     except Exception as e:
         print(f"Error removing criteria: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def update_single_criteria(criteria_id, quantity, criteria, username):
@@ -3569,51 +4393,67 @@ def update_single_criteria(criteria_id, quantity, criteria, username):
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            UPDATE trade_criteria SET
-                quantity_required = ?,
-                registry = ?,
-                product = ?,
-                project_type = ?,
-                protocol = ?,
-                project_id = ?,
-                vintage_from = ?,
-                vintage_to = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND status = 'criteria_only'
-        """, (
-            quantity,
-            criteria.get('registry'),
-            criteria.get('product'),
-            criteria.get('project_type'),
-            criteria.get('protocol'),
-            criteria.get('project_id'),
-            criteria.get('vintage_from'),
-            criteria.get('vintage_to'),
-            criteria_id
-        ))
+            cursor.execute("""
+                UPDATE trade_criteria SET
+                    quantity_required = ?,
+                    registry = ?,
+                    product = ?,
+                    project_type = ?,
+                    protocol = ?,
+                    project_id = ?,
+                    vintage_from = ?,
+                    vintage_to = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'criteria_only'
+            """, (
+                quantity,
+                criteria.get('registry'),
+                criteria.get('product'),
+                criteria.get('project_type'),
+                criteria.get('protocol'),
+                criteria.get('project_id'),
+                criteria.get('vintage_from'),
+                criteria.get('vintage_to'),
+                criteria_id
+            ))
 
-        updated = cursor.rowcount
-        conn.commit()
+            updated = cursor.rowcount
+            conn.commit()
 
-        if updated > 0:
-            return True, f"Updated criteria {criteria_id}"
-        else:
-            return False, "Criteria not found"
+            if updated > 0:
+                return True, f"Updated criteria {criteria_id}"
+            else:
+                return False, "Criteria not found"
 
     except Exception as e:
         print(f"Error updating criteria: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
+# FIFO reduction of a trade's criteria_only quantities (params: trade_id, amount).
+# `before` is the quantity held by earlier criteria; a criteria is touched only
+# when the amount reaches past it, and ends at 0 when fully consumed. The CTE is
+# materialized so every row sees the quantities from before the update.
+_REDUCE_CRITERIA_SQL = """
+    WITH fifo AS MATERIALIZED (
+        SELECT id,
+               SUM(quantity_required) OVER (ORDER BY id) AS through,
+               SUM(quantity_required) OVER (ORDER BY id) - quantity_required AS before
+        FROM trade_criteria
+        WHERE trade_id = ?1 AND direction = 'sell' AND status = 'criteria_only'
+          AND quantity_required > 0
+    )
+    UPDATE trade_criteria SET
+        quantity_required = MAX(0, (SELECT through FROM fifo WHERE fifo.id = trade_criteria.id) - ?2),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id IN (SELECT id FROM fifo WHERE before < ?2)
+    RETURNING id, quantity_required
+"""
+
 def update_criteria_quantity(trade_id, delta, username):
     """
     Update criteria quantities for a trade when inventory is assigned/unassigned.
@@ -3630,66 +4470,91 @@ def update_criteria_quantity(trade_id, delta, username):
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
-
-        # Get all criteria for this trade ordered by ID (FIFO)
-        cursor.execute("""
-            SELECT id, quantity_required FROM trade_criteria
-            WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
-            ORDER BY id ASC
-        """, (str(trade_id),))
-        criteria_list = cursor.fetchall()
-
-        if not criteria_list:
-            return True, "No criteria to update"
-
-        remaining_delta = delta
-
-        if delta < 0:
-            # Reducing quantity (assigning inventory)
-            amount_to_reduce = abs(delta)
-            for crit in criteria_list:
-                if amount_to_reduce <= 0:
-                    break
-                crit_id = crit['id']
-                crit_qty = crit['quantity_required'] or 0
-
-                if crit_qty > 0:
-                    reduce_by = min(crit_qty, amount_to_reduce)
-                    new_qty = crit_qty - reduce_by
-                    amount_to_reduce -= reduce_by
-
-                    if new_qty <= 0:
-                        # Remove criteria if quantity reaches 0
-                        cursor.execute("DELETE FROM trade_criteria WHERE id = ?", (crit_id,))
-                    else:
-                        cursor.execute("""
-                            UPDATE trade_criteria SET quantity_required = ?, updated_at = CURRENT_TIMESTAMP
-                            WHERE id = ?
-                        """, (new_qty, crit_id))
-        else:
-            # Increasing quantity (unassigning inventory)
-            # Add to the first criteria, or create new one if none exist
-            if criteria_list:
-                first_crit = criteria_list[0]
-                new_qty = (first_crit['quantity_required'] or 0) + delta
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            if delta < 0 and _HAS_RETURNING:
+                # Reduce FIFO in one statement: each criteria with quantity left
+                # gives up whatever the earlier ones could not cover
+                cursor.execute(_REDUCE_CRITERIA_SQL, (str(trade_id), abs(delta)))
+                reduced = cursor.fetchall()
+
+                # Remove criteria whose quantity reached 0
+                emptied = [row['id'] for row in reduced if row['quantity_required'] <= 0]
+                if emptied:
+                    cursor.execute("DELETE FROM trade_criteria WHERE id IN (SELECT value FROM json_each(?))",
+                                   (_json_dumps(emptied),))
+
+                if not reduced:
+                    cursor.execute("""
+                        SELECT 1 FROM trade_criteria
+                        WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
+                        LIMIT 1
+                    """, (str(trade_id),))
+                    if cursor.fetchone() is None:
+                        return True, "No criteria to update"
+
+            elif delta < 0:
+                # Get all criteria for this trade ordered by ID (FIFO)
                 cursor.execute("""
+                    SELECT id, quantity_required FROM trade_criteria
+                    WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
+                    ORDER BY id ASC
+                """, (str(trade_id),))
+                criteria_list = cursor.fetchall()
+
+                if not criteria_list:
+                    return True, "No criteria to update"
+
+                # Reducing quantity (assigning inventory)
+                amount_to_reduce = abs(delta)
+                to_update = []
+                to_delete = []
+                for crit in criteria_list:
+                    if amount_to_reduce <= 0:
+                        break
+                    crit_id = crit['id']
+                    crit_qty = crit['quantity_required'] or 0
+
+                    if crit_qty > 0:
+                        reduce_by = min(crit_qty, amount_to_reduce)
+                        new_qty = crit_qty - reduce_by
+                        amount_to_reduce -= reduce_by
+
+                        if new_qty <= 0:
+                            # Remove criteria if quantity reaches 0
+                            to_delete.append((crit_id,))
+                        else:
+                            to_update.append((new_qty, crit_id))
+
+                cursor.executemany("""
                     UPDATE trade_criteria SET quantity_required = ?, updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
-                """, (new_qty, first_crit['id']))
+                """, to_update)
+                cursor.executemany("DELETE FROM trade_criteria WHERE id = ?", to_delete)
+            else:
+                # Increasing quantity (unassigning inventory): add to the first criteria
+                cursor.execute("""
+                    UPDATE trade_criteria SET
+                        quantity_required = COALESCE(quantity_required, 0) + ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = (
+                        SELECT MIN(id) FROM trade_criteria
+                        WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
+                    )
+                """, (delta, str(trade_id)))
+                if cursor.rowcount == 0:
+                    return True, "No criteria to update"
+
+            conn.commit()
 
-        conn.commit()
         return True, f"Updated criteria quantities for trade {trade_id}"
 
     except Exception as e:
         print(f"Error updating criteria quantity: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def update_specific_criteria_quantity(criteria_id, delta, username):
@@ -3704,42 +4569,38 @@ def update_specific_criteria_quantity(criteria_id, delta, username):
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get the specific criteria
-        cursor.execute("""
-            SELECT id, quantity_required, trade_id FROM trade_criteria
-            WHERE id = ? AND status = 'criteria_only'
-        """, (criteria_id,))
-        criteria = cursor.fetchone()
+            # Get the specific criteria
+            cursor.execute("""
+                SELECT id, quantity_required, trade_id FROM trade_criteria
+                WHERE id = ? AND status = 'criteria_only'
+            """, (criteria_id,))
+            criteria = cursor.fetchone()
 
-        if not criteria:
-            return True, "Criteria not found or not active"
+            if not criteria:
+                return True, "Criteria not found or not active"
 
-        crit_qty = criteria['quantity_required'] or 0
-        new_qty = crit_qty + delta
+            crit_qty = criteria['quantity_required'] or 0
+            new_qty = crit_qty + delta
 
-        if new_qty <= 0:
-            # Remove criteria if quantity reaches 0
-            cursor.execute("DELETE FROM trade_criteria WHERE id = ?", (criteria_id,))
-        else:
-            cursor.execute("""
-                UPDATE trade_criteria SET quantity_required = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (new_qty, criteria_id))
+            if new_qty <= 0:
+                # Remove criteria if quantity reaches 0
+                cursor.execute("DELETE FROM trade_criteria WHERE id = ?", (criteria_id,))
+            else:
+                cursor.execute("""
+                    UPDATE trade_criteria SET quantity_required = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (new_qty, criteria_id))
 
-        conn.commit()
-        return True, f"Updated criteria {criteria_id} quantity"
+            conn.commit()
+            return True, f"Updated criteria {criteria_id} quantity"
 
     except Exception as e:
         print(f"Error updating specific criteria quantity: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_trade_criteria_ids(trade_id):
@@ -3752,25 +4613,21 @@ def get_trade_criteria_ids(trade_id):
     Returns:
         list of criteria IDs
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT id FROM trade_criteria
-            WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
-            ORDER BY id ASC
-        """, (str(trade_id),))
+            cursor.execute("""
+                SELECT id FROM trade_criteria
+                WHERE trade_id = ? AND direction = 'sell' AND status = 'criteria_only'
+                ORDER BY id ASC
+            """, (str(trade_id),))
 
-        return [row['id'] for row in cursor.fetchall()]
+            return [row['id'] for row in cursor.fetchall()]
 
     except Exception as e:
         print(f"Error getting criteria IDs: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_criteria_by_id(criteria_id):
@@ -3783,30 +4640,26 @@ def get_criteria_by_id(criteria_id):
     Returns:
         dict with criteria details or None if not found
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT id, trade_id, direction, quantity_required, quantity_fulfilled,
-                   market, registry, product, project_type, protocol, project_id,
-                   vintage_from, vintage_to, status, created_by, created_at, updated_at
-            FROM trade_criteria
-            WHERE id = ?
-        """, (criteria_id,))
+            cursor.execute("""
+                SELECT id, trade_id, direction, quantity_required, quantity_fulfilled,
+                       market, registry, product, project_type, protocol, project_id,
+                       vintage_from, vintage_to, status, created_by, created_at, updated_at
+                FROM trade_criteria
+                WHERE id = ?
+            """, (criteria_id,))
 
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+            row = cursor.fetchone()
+            if row:
+                return dict(row)
+            return None
 
     except Exception as e:
         print(f"Error getting criteria by ID: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 
 def restore_criteria_on_unassign(criteria_id, quantity, username, criteria_snapshot=None):
@@ -3823,65 +4676,141 @@ def restore_criteria_on_unassign(criteria_id, quantity, username, criteria_snaps
     Returns:
         (success, message)
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
 
-        # Check if criteria still exists
-        cursor.execute("""
-            SELECT id, quantity_required, trade_id, direction, market, registry, product,
-                   project_type, protocol, project_id, vintage_from, vintage_to, status, created_by
-            FROM trade_criteria
-            WHERE id = ?
-        """, (criteria_id,))
-        criteria = cursor.fetchone()
-
-        if criteria:
-            # Criteria exists - add quantity back
-            new_qty = (criteria['quantity_required'] or 0) + quantity
+            # Add the quantity back if the criteria still exists; the row count
+            # tells whether it does, so no separate SELECT is needed
             cursor.execute("""
-                UPDATE trade_criteria SET quantity_required = ?, updated_at = CURRENT_TIMESTAMP
+                UPDATE trade_criteria SET
+                    quantity_required = COALESCE(quantity_required, 0) + ?,
+                    updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
-            """, (new_qty, criteria_id))
-            conn.commit()
-            return True, f"Restored {quantity} to existing criteria {criteria_id}"
-        elif criteria_snapshot:
-            # Criteria was deleted - recreate it with saved attributes
-            cursor.execute("""
+            """, (quantity, criteria_id))
+
+            if cursor.rowcount:
+                conn.commit()
+                return True, f"Restored {quantity} to existing criteria {criteria_id}"
+            elif criteria_snapshot:
+                # Criteria was deleted - recreate it with saved attributes
+                cursor.execute("""
+                    INSERT INTO trade_criteria (
+                        trade_id, direction, quantity_required, quantity_fulfilled,
+                        market, registry, product, project_type, protocol, project_id,
+                        vintage_from, vintage_to, status, created_by, created_at, updated_at
+                    ) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, 'criteria_only', ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                """, (
+                    criteria_snapshot.get('trade_id'),
+                    criteria_snapshot.get('direction', 'sell'),
+                    quantity,
+                    criteria_snapshot.get('market'),
+                    criteria_snapshot.get('registry'),
+                    criteria_snapshot.get('product'),
+                    criteria_snapshot.get('project_type'),
+                    criteria_snapshot.get('protocol'),
+                    criteria_snapshot.get('project_id'),
+                    criteria_snapshot.get('vintage_from'),
+                    criteria_snapshot.get('vintage_to'),
+                    username
+                ))
+                new_criteria_id = cursor.lastrowid
+                conn.commit()
+                return True, f"Recreated criteria with {quantity} items (new ID: {new_criteria_id})"
+            else:
+                return False, "Criteria not found and no snapshot to recreate"
+
+    except Exception as e:
+        print(f"Error restoring criteria on unassign: {e}")
+        return False, str(e)
+
+
+def restore_criteria_on_unassign_bulk(restores, username):
+    """
+    Restore criteria quantities for many unassigned groups in one transaction.
+
+    Criteria that still exist get their quantity added back; deleted ones are
+    recreated from their snapshot (entries without a snapshot are skipped).
+
+    Args:
+        restores: iterable of (criteria_id, quantity, criteria_snapshot)
+        username: user performing the action
+
+    Returns:
+        (success, message)
+    """
+    restores = list(restores)
+    if not restores:
+        return True, "No criteria to restore"
+
+    try:
+        with inventory_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            cursor.execute(
+                "SELECT id FROM trade_criteria WHERE id IN (SELECT value FROM json_each(?))",
+                (_json_dumps([criteria_id for criteria_id, _, _ in restores]),)
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+            cursor.executemany("""
+                UPDATE trade_criteria SET
+                    quantity_required = COALESCE(quantity_required, 0) + ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(quantity, criteria_id) for criteria_id, quantity, _ in restores
+                  if criteria_id in existing])
+            updated = cursor.rowcount
+
+            # Criteria that were deleted - recreate them with saved attributes
+            cursor.executemany("""
                 INSERT INTO trade_criteria (
                     trade_id, direction, quantity_required, quantity_fulfilled,
                     market, registry, product, project_type, protocol, project_id,
                     vintage_from, vintage_to, status, created_by, created_at, updated_at
                 ) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, 'criteria_only', ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            """, (
-                criteria_snapshot.get('trade_id'),
-                criteria_snapshot.get('direction', 'sell'),
+            """, [(
+                snapshot.get('trade_id'),
+                snapshot.get('direction', 'sell'),
                 quantity,
-                criteria_snapshot.get('market'),
-                criteria_snapshot.get('registry'),
-                criteria_snapshot.get('product'),
-                criteria_snapshot.get('project_type'),
-                criteria_snapshot.get('protocol'),
-                criteria_snapshot.get('project_id'),
-                criteria_snapshot.get('vintage_from'),
-                criteria_snapshot.get('vintage_to'),
+                snapshot.get('market'),
+                snapshot.get('registry'),
+                snapshot.get('product'),
+                snapshot.get('project_type'),
+                snapshot.get('protocol'),
+                snapshot.get('project_id'),
+                snapshot.get('vintage_from'),
+                snapshot.get('vintage_to'),
                 username
-            ))
-            new_criteria_id = cursor.lastrowid
+            ) for criteria_id, quantity, snapshot in restores
+                if criteria_id not in existing and snapshot])
+            recreated = cursor.rowcount
+
             conn.commit()
-            return True, f"Recreated criteria with {quantity} items (new ID: {new_criteria_id})"
-        else:
-            return False, "Criteria not found and no snapshot to recreate"
 
+        return True, f"Restored {updated} existing and recreated {recreated} deleted criteria"
     except Exception as e:
         print(f"Error restoring criteria on unassign: {e}")
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
+# Fixed SQL text for get_inventory_criteria_info: the id/serial lists are bound
+# as one JSON array, so every call reuses the same prepared statements whatever
+# the number of serials (an IN (?, ...) list compiles anew for each length)
+_CRITERIA_INFO_BY_SERIALS_SQL = """
+    SELECT serial, criteria_id, trade_id, criteria_snapshot
+    FROM inventory
+    WHERE serial IN (SELECT value FROM json_each(?)) AND criteria_id
+"""
+_CRITERIA_BY_IDS_SQL = """
+    SELECT id, trade_id, direction, quantity_required, market, registry, product,
+           project_type, protocol, project_id, vintage_from, vintage_to, status
+    FROM trade_criteria
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
 def get_inventory_criteria_info(serials):
     """
     Get criteria information for inventory items by their serials.
@@ -3893,57 +4822,47 @@ def get_inventory_criteria_info(serials):
     Returns:
         dict: {serial: {'criteria_id': id, 'criteria_snapshot': {...}}}
     """
-    conn = None
     try:
-        conn = get_inventory_db_connection()
-        cursor = conn.cursor()
+        with inventory_read_connection() as conn:
+            cursor = conn.cursor()
 
-        result = {}
-        for serial in serials:
-            # Get the criteria_id and stored snapshot from inventory
-            cursor.execute("""
-                SELECT criteria_id, trade_id, criteria_snapshot FROM inventory WHERE serial = ?
-            """, (serial,))
-            inv = cursor.fetchone()
+            # Get the criteria_id and stored snapshot of every serial at once
+            cursor.execute(_CRITERIA_INFO_BY_SERIALS_SQL, (_json_dumps(list(dict.fromkeys(serials))),))
+            inventory_rows = {inv['serial']: inv for inv in cursor.fetchall()}
 
-            if inv and inv['criteria_id']:
-                criteria_id = inv['criteria_id']
-                stored_snapshot = inv['criteria_snapshot']
+            # Get the criteria details (missing when the criteria was deleted)
+            criteria_ids = list({inv['criteria_id'] for inv in inventory_rows.values()})
+            cursor.execute(_CRITERIA_BY_IDS_SQL, (_json_dumps(criteria_ids),))
+            criteria_by_id = {crit['id']: crit for crit in cursor.fetchall()}
 
-                # Get the criteria details (may be None if deleted)
-                cursor.execute("""
-                    SELECT id, trade_id, direction, quantity_required, market, registry, product,
-                           project_type, protocol, project_id, vintage_from, vintage_to, status
-                    FROM trade_criteria
-                    WHERE id = ?
-                """, (criteria_id,))
-                crit = cursor.fetchone()
+        result = {}
+        for serial in serials:
+            inv = inventory_rows.get(serial)
+            if inv is None:
+                continue
+            criteria_id = inv['criteria_id']
+            stored_snapshot = inv['criteria_snapshot']
+            crit = criteria_by_id.get(criteria_id)
 
-                if crit:
+            if crit:
+                result[serial] = {
+                    'criteria_id': criteria_id,
+                    'criteria_snapshot': dict(crit)
+                }
+            elif stored_snapshot:
+                # Criteria was deleted - use the stored snapshot
+                snapshot_dict = parse_criteria_snapshot(stored_snapshot)
+                if snapshot_dict is not None:
                     result[serial] = {
                         'criteria_id': criteria_id,
-                        'criteria_snapshot': dict(crit)
+                        'criteria_snapshot': snapshot_dict
                     }
-                elif stored_snapshot:
-                    # Criteria was deleted - use the stored snapshot
-                    try:
-                        snapshot_dict = json.loads(stored_snapshot)
-                        result[serial] = {
-                            'criteria_id': criteria_id,
-                            'criteria_snapshot': snapshot_dict
-                        }
-                    except (json.JSONDecodeError, TypeError):
-                        pass
 
         return result
 
     except Exception as e:
         print(f"Error getting inventory criteria info: {e}")
         return {}
-    finally:
-        if conn:
-            conn.close()
-
 
 if __name__ == '__main__':
     init_database()
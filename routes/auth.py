@@ -4,7 +4,7 @@ Authentication routes and decorators for Carbon IMS
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from functools import wraps
-from database import get_user_by_username, verify_user_password, check_page_access, log_activity
+from database import get_user_by_username, get_user_role, verify_user_password, check_page_access, log_activity
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -27,8 +27,7 @@ def admin_required(f):
         if 'user' not in session:
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('auth.login'))
-        user = get_user_by_username(session['user'])
-        if not user or user['role'] != 'admin':
+        if get_user_role(session['user']) != 'admin':
             flash('You do not have permission to access this page.', 'danger')
             return redirect(url_for('auth.home'))
         return f(*args, **kwargs)
@@ -41,11 +40,11 @@ def write_access_required(f):
     def decorated_function(*args, **kwargs):
         if 'user' not in session:
             return jsonify({'error': 'Authentication required'}), 401
-        user = get_user_by_username(session['user'])
-        if not user:
+        role = get_user_role(session['user'])
+        if not role:
             return jsonify({'error': 'User not found'}), 401
         # Only admin and trader have write access, ops is read-only
-        if user['role'] not in ['admin', 'trader']:
+        if role not in ['admin', 'trader']:
             return jsonify({'error': 'You do not have permission to modify the inventory. Your role is read-only.'}), 403
         return f(*args, **kwargs)
     return decorated_function
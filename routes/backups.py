@@ -3,14 +3,18 @@ Backup and restore routes for Carbon IMS
 """
 
 from flask import Blueprint, request, session, jsonify
-from datetime import datetime
-import pytz
+from contextlib import closing
+from itertools import groupby
+from operator import itemgetter
 from routes.auth import admin_required
+from routes.streaming import stream_json_response
 from database import (
-    get_all_inventory_backups,
+    _json_dumps,
+    iter_inventory_backups_grouped,
     restore_inventory_backup,
     delete_inventory_backup,
-    create_inventory_backup
+    delete_inventory_backups_by_date,
+    create_inventory_backup_async
 )
 
 backups_bp = Blueprint('backups', __name__)
@@ -21,50 +25,32 @@ backups_bp = Blueprint('backups', __name__)
 def list_backups():
     """List all inventory backups grouped by date"""
     try:
-        backups_data = get_all_inventory_backups()
-        grouped_backups = {}
-
-        for backup in backups_data:
-            created_at = backup['created_at']
-            try:
-                # Parse the UTC timestamp from database
-                dt_utc = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                dt_utc = pytz.utc.localize(dt_utc)
-                # Convert to Eastern Time
-                eastern = pytz.timezone('US/Eastern')
-                dt_eastern = dt_utc.astimezone(eastern)
-                # Format in 12-hour format
-                date_only = dt_eastern.strftime('%Y-%m-%d')
-                time_only = dt_eastern.strftime('%I:%M:%S %p')
-            except:
-                date_only = 'Unknown'
-                time_only = created_at
-
-            backup_info = {
-                'id': backup['id'],
-                'filename': str(backup['id']),
-                'date': created_at,
-                'date_only': date_only,
-                'time_only': time_only,
-                'size': 0,
-                'username': backup['username'],
-                'action': backup['action'],
-                'summary': backup.get('summary', None)
-            }
-
-            if date_only not in grouped_backups:
-                grouped_backups[date_only] = []
-            grouped_backups[date_only].append(backup_info)
-
-        # Sort backups within each group by ID (newest first)
-        for date in grouped_backups:
-            grouped_backups[date].sort(key=lambda x: x['id'], reverse=True)
-
-        # Sort dates (newest first)
-        sorted_dates = sorted(grouped_backups.keys(), reverse=True)
-        sorted_grouped = {date: grouped_backups[date] for date in sorted_dates}
-
-        return jsonify({'backups': backups_data, 'grouped': sorted_grouped})
+        # Rows arrive with Eastern date/time computed and ordered by
+        # date then ID (newest first), so the response streams one date
+        # group at a time
+        backups = iter_inventory_backups_grouped()
+
+        def date_groups():
+            # Closing the groups closes the rows, returning the pooled connection
+            with closing(backups):
+                for date_only, group in groupby(backups, key=itemgetter('date_only')):
+                    group_list = [
+                        {
+                            'id': backup['id'],
+                            'filename': str(backup['id']),
+                            'date': backup['created_at'],
+                            'date_only': date_only,
+                            'time_only': backup['time_only'],
+                            'size': 0,
+                            'username': backup['username'],
+                            'action': backup['action'],
+                            'summary': backup['summary']
+                        }
+                        for backup in group
+                    ]
+                    yield f'{_json_dumps(date_only)}: {_json_dumps(group_list)}'
+
+        return stream_json_response('{"grouped": {', date_groups(), '}}')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -74,7 +60,8 @@ def list_backups():
 def restore_backup():
     """Restore inventory from a backup"""
     try:
-        backup_id = request.json.get('filename')
+        data = request.get_json(silent=True) or {}
+        backup_id = data.get('filename')
         username = session.get('user')
 
         if not backup_id:
@@ -91,7 +78,7 @@ def restore_backup():
             return jsonify({'error': message}), 404
 
         # Create a backup of the restored state
-        create_inventory_backup(username, f'Restored from backup ID: {backup_id}')
+        create_inventory_backup_async(username, f'Restored from backup ID: {backup_id}')
 
         return jsonify({'success': True, 'message': 'Inventory restored successfully'})
     except Exception as e:
@@ -103,7 +90,8 @@ def restore_backup():
 def delete_backup():
     """Delete a specific backup"""
     try:
-        backup_id = request.json.get('filename')
+        data = request.get_json(silent=True) or {}
+        backup_id = data.get('filename')
 
         if not backup_id:
             return jsonify({'error': 'Backup ID is required'}), 400
@@ -128,25 +116,18 @@ def delete_backup():
 def delete_backups_by_date():
     """Delete all backups from a specific date"""
     try:
-        date_to_delete = request.json.get('date')
+        data = request.get_json(silent=True) or {}
+        date_to_delete = data.get('date')
 
         if not date_to_delete:
             return jsonify({'error': 'Date is required'}), 400
 
-        backups = get_all_inventory_backups()
-        deleted_count = 0
+        success, result = delete_inventory_backups_by_date(date_to_delete)
 
-        for backup in backups:
-            created_at = backup['created_at']
-            try:
-                dt = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                backup_date = dt.strftime('%Y-%m-%d')
+        if not success:
+            return jsonify({'error': result}), 500
 
-                if backup_date == date_to_delete:
-                    delete_inventory_backup(backup['id'])
-                    deleted_count += 1
-            except:
-                continue
+        deleted_count = result
 
         return jsonify({
             'success': True,
@@ -116,13 +116,12 @@ def parse_date(date_str):
     """Helper function to parse dates in multiple formats"""
     if not date_str:
         return None
+    # Pick the format up front so US-style dates don't pay for a failed ISO parse
     try:
-        return datetime.strptime(date_str, '%Y-%m-%d').date()
-    except:
-        try:
-            return datetime.strptime(date_str, '%m/%d/%Y').date()
-        except:
-            return None
+        date_format = '%m/%d/%Y' if '/' in date_str else '%Y-%m-%d'
+        return datetime.strptime(date_str, date_format).date()
+    except (TypeError, ValueError):
+        return None
 
 
 def get_warranty_status(end_date, today):
@@ -14,6 +14,7 @@ from database import (
     update_inventory_item,
     delete_inventory_item,
     create_inventory_backup,
+    create_inventory_backup_async,
     get_user_page_settings,
     verify_user_password,
     get_inventory_db_connection,
@@ -100,7 +101,7 @@ def update_inventory():
         headers = get_inventory_headers()
         first_col = headers[0] if headers else 'Unknown'
         item_identifier = row_data.get(first_col, 'Unknown')
-        create_inventory_backup(username, f'Updated item: {item_identifier}')
+        create_inventory_backup_async(username, f'Updated item: {item_identifier}')
 
         # Log the activity
         log_activity(
@@ -138,7 +139,7 @@ def add_inventory():
         headers = get_inventory_headers()
         first_col = headers[0] if headers else 'Unknown'
         item_identifier = row_data.get(first_col, 'N/A')
-        create_inventory_backup(username, f'Added item: {item_identifier}')
+        create_inventory_backup_async(username, f'Added item: {item_identifier}')
 
         # Log the activity
         log_activity(
@@ -185,7 +186,7 @@ def delete_inventory():
             return jsonify({'error': message}), 404
 
         # Create backup after delete
-        create_inventory_backup(username, f'Deleted item: {deleted_item}')
+        create_inventory_backup_async(username, f'Deleted item: {deleted_item}')
 
         # Log the activity
         log_activity(
@@ -246,7 +247,7 @@ def bulk_delete_inventory():
         if len(deleted_serials) > 10:
             summary += f' and {len(deleted_serials) - 10} more'
 
-        create_inventory_backup(username, summary)
+        create_inventory_backup_async(username, summary)
 
         # Log each deleted item
         for i, serial in enumerate(deleted_serials):
@@ -334,7 +335,7 @@ def commit_batch():
         # Create backup with summary
         total_changes = len(modifications) + len(additions) + len(deletions)
         action_desc = f'Batch commit: {total_changes} change(s)'
-        create_inventory_backup(username, action_desc, changes_summary)
+        create_inventory_backup_async(username, action_desc, changes_summary)
 
         return jsonify({'success': True, 'message': 'Batch committed successfully'})
     except Exception as e:
@@ -500,7 +501,7 @@ def import_csv():
             'deleted': [] if mode == 'append' else [{'Serial': 'All previous records replaced'}]
         }
         action_desc = f'CSV Import ({mode}): {imported_count} imported, {skipped_count} skipped'
-        create_inventory_backup(username, action_desc, import_summary)
+        create_inventory_backup_async(username, action_desc, import_summary)
 
         # Log the import activity
         log_activity(
@@ -63,12 +63,22 @@ def get_logs():
         limit = int(request.args.get('limit', 500))
         offset = int(request.args.get('offset', 0))
 
-        logs = get_activity_logs(filters if filters else None, limit, offset)
+        # Keyset cursor: created_at and id of the last log already loaded
+        cursor_created_at = request.args.get('cursor_created_at')
+        cursor_id = request.args.get('cursor_id', type=int)
+
+        logs = get_activity_logs(filters if filters else None, limit, offset,
+                                 cursor_created_at, cursor_id)
+
+        next_cursor = None
+        if logs:
+            next_cursor = {'created_at': logs[-1]['created_at'], 'id': logs[-1]['id']}
 
         return jsonify({
             'success': True,
             'logs': logs,
-            'count': len(logs)
+            'count': len(logs),
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -4,9 +4,11 @@ Supports: Verra, Gold Standard, ACR, CAR
 """
 
 from flask import Blueprint, render_template, request, jsonify
-import requests
 from routes.auth import login_required
 
+# requests (and urllib3 under it) is imported inside the registry API helpers,
+# so app startup doesn't pay for it until a registry lookup is made
+
 registry_bp = Blueprint('registry', __name__)
 
 
@@ -76,6 +78,8 @@ def get_registry_project():
 
 def search_verra(query, search_type):
     """Search Verra VCS registry using POST API"""
+    import requests
+
     try:
         url = 'https://registry.verra.org/uiapi/resource/resource/search?$skip=0&$top=50&$count=true'
 
@@ -155,6 +159,8 @@ def extract_verra_fields(item):
 
 def get_verra_project(project_id):
     """Get detailed Verra project information"""
+    import requests
+
     try:
         url = f'https://registry.verra.org/uiapi/resource/resource/search?$skip=0&$top=1&$count=true'
 
@@ -189,6 +195,8 @@ def get_verra_project(project_id):
 
 def search_goldstandard(query, search_type):
     """Search Gold Standard registry"""
+    import requests
+
     try:
         url = f'https://registry.goldstandard.org/projects?q={query}&page=1'
 
@@ -225,6 +233,8 @@ def search_goldstandard(query, search_type):
 
 def get_goldstandard_project(project_id):
     """Get detailed Gold Standard project information"""
+    import requests
+
     try:
         headers = {
             'Accept': 'application/json',
@@ -0,0 +1,37 @@
+"""
+Streamed JSON responses for Carbon IMS routes
+"""
+
+from flask import Response, stream_with_context
+
+
+def stream_json_response(prefix, chunks, suffix):
+    """
+    Stream prefix, the comma-separated chunks, then suffix as a JSON response.
+
+    chunks is an iterable of already-encoded JSON text, usually a generator
+    over a database cursor. The first chunk is read before the Response is
+    built, so the query runs (and any error reaches the caller's error
+    handling) before a 200 is sent.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+
+    def generate():
+        yield prefix
+        try:
+            if first is not None:
+                yield first
+                for chunk in chunks:
+                    yield ',' + chunk
+        except Exception as e:
+            # Headers are already sent; leave the body unterminated so the client
+            # fails to parse it instead of taking a short result as complete
+            print(f"Error streaming JSON response: {e}")
+            return
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+        yield suffix
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -2,13 +2,17 @@
 Trades management routes for Carbon IMS
 """
 
+from contextlib import closing
 from flask import Blueprint, render_template, request, session, jsonify
 from routes.auth import login_required, write_access_required, page_access_required
+from routes.streaming import stream_json_response
 from database import (
+    _json_dumps,
     get_user_by_username,
     get_all_inventory_items,
-    get_unassigned_inventory,
     get_inventory_by_trade,
+    iter_unassigned_inventory,
+    iter_inventory_by_trade,
     assign_inventory_to_trade,
     unassign_inventory_from_trade,
     create_serials_for_trade,
@@ -51,6 +55,16 @@ from trades_data import (
 trades_bp = Blueprint('trades', __name__)
 
 
+def _stream_data_response(items):
+    """Stream {"data": [...]} from an iterable of items without building the full list"""
+    def encoded():
+        # Closing the encoded stream closes items, returning its pooled connection
+        with closing(items):
+            for item in items:
+                yield _json_dumps(item)
+    return stream_json_response('{"data": [', encoded(), ']}')
+
+
 @trades_bp.route('/trades')
 @login_required
 @page_access_required('trades')
@@ -182,8 +196,7 @@ def get_trade_details(deal_number):
 def get_available_inventory():
     """Get inventory items available for assignment"""
     try:
-        items = get_unassigned_inventory()
-        return jsonify({'data': items})
+        return _stream_data_response(iter_unassigned_inventory())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -193,8 +206,7 @@ def get_available_inventory():
 def get_assigned_inventory(deal_number):
     """Get inventory items assigned to a specific trade"""
     try:
-        items = get_inventory_by_trade(deal_number)
-        return jsonify({'data': items})
+        return _stream_data_response(iter_inventory_by_trade(deal_number))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 